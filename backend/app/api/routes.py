@@ -1,8 +1,158 @@
-from fastapi import APIRouter
-from typing import Dict
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import Dict, Optional
+from ..core.security import require_admin
+from ..services.admission import admission
+from ..services.calibration import calibration_store
+from ..services.leaderboard import leaderboard
+from ..services.profiler import profiler
+from ..services.utils import deep_getsizeof
+from ..services.video import process_upload
+from .websocket import sessions
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
 
 router = APIRouter(prefix="/api", tags=["api"])
 
 @router.get("/session/{session_id}")
 async def get_session(session_id: str) -> Dict:
-    return {"session_id": session_id, "status": "active"}
\ No newline at end of file
+    return {"session_id": session_id, "status": "active"}
+
+def _session_memory(session: Dict) -> Dict:
+    # Tracker state of sharded sessions lives in the analysis workers
+    usage = session["tracker"].memory_usage() if "tracker" in session else {}
+    usage["frame_cache"] = deep_getsizeof(session["frame_cache"])
+    usage["total"] = sum(usage.values())
+    return usage
+
+def _session_memory_estimate(session: Dict) -> int:
+    """Constant-time-per-session estimate of _session_memory()["total"]"""
+    frame_cache = session["frame_cache"]
+    estimate = sys.getsizeof(frame_cache) + sum(sys.getsizeof(message) for message in frame_cache.values())
+    if "tracker" in session:
+        estimate += session["tracker"].memory_estimate()
+    return estimate
+
+@router.get("/session/{session_id}/memory")
+async def get_session_memory(session_id: str) -> Dict:
+    """Approximate memory held by one live session, in bytes"""
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"session_id": session_id, "memory": _session_memory(session)}
+
+@router.get("/sessions/memory")
+async def get_sessions_memory() -> Dict:
+    """Estimated memory held by all live sessions, in bytes (see /session/{id}/memory for a measurement)"""
+    per_session = {session_id: _session_memory_estimate(session) for session_id, session in sessions.items()}
+    return {"sessions": len(per_session), "total": sum(per_session.values()), "per_session": per_session}
+
+@router.get("/admission")
+async def get_admission_status() -> Dict:
+    """Session count, frame rate and shed level of this worker"""
+    return admission.status()
+
+@router.get("/calibration/{camera_id}")
+async def get_calibration(camera_id: str, athlete_id: Optional[str] = None) -> Dict:
+    """Calibration a new session on this camera would start from"""
+    profile = await asyncio.to_thread(calibration_store.load, camera_id, athlete_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No calibration for this camera")
+    return {"camera_id": camera_id, "athlete_id": athlete_id, "calibration": profile}
+
+@router.delete("/calibration/{camera_id}")
+async def delete_calibration(camera_id: str, athlete_id: Optional[str] = None) -> Dict:
+    """Forget a camera's (or one athlete's) calibration after the camera is moved"""
+    if not await asyncio.to_thread(calibration_store.delete, camera_id, athlete_id):
+        raise HTTPException(status_code=404, detail="No calibration for this camera")
+    return {"camera_id": camera_id, "athlete_id": athlete_id}
+
+@router.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_hot_path(seconds: float = 10.0, session_id: Optional[str] = None,
+                           allocations: bool = False, format: str = "json"):
+    """Sample the event loop for N seconds and return collapsed stacks (format=collapsed for plain text)"""
+    try:
+        profile = await profiler.profile(seconds, session_id, allocations)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "collapsed":
+        return PlainTextResponse(profile["collapsed"] + "\n")
+    return profile
+
+@router.put("/heats/{heat_id}/sessions/{session_id}")
+async def register_heat_session(heat_id: str, session_id: str) -> Dict:
+    """Add a session to a heat leaderboard"""
+    session = sessions.get(session_id)
+    stats = session["tracker"].stats if session is not None and "tracker" in session else None
+    leaderboard.register(heat_id, session_id, stats)
+    return {"heat_id": heat_id, "session_id": session_id}
+
+@router.delete("/heats/{heat_id}/sessions/{session_id}")
+async def unregister_heat_session(heat_id: str, session_id: str) -> Dict:
+    """Remove a session from its heat leaderboard"""
+    if leaderboard.session_heats.get(session_id) != heat_id:
+        raise HTTPException(status_code=404, detail="Session not in heat")
+    leaderboard.unregister(session_id)
+    return {"heat_id": heat_id, "session_id": session_id}
+
+@router.get("/heats/{heat_id}")
+async def get_heat_standings(heat_id: str, limit: Optional[int] = None) -> Dict:
+    """Current top-k standings of a heat"""
+    standings = leaderboard.standings(heat_id, limit)
+    if standings is None:
+        raise HTTPException(status_code=404, detail="Heat not found")
+    return {"heat_id": heat_id, "standings": standings}
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class _TempFileStreamingResponse(StreamingResponse):
+    """Streaming response that deletes its temp file however the response ends.
+
+    Cleanup can't live in the body generator: if the client disconnects before
+    streaming starts, the generator never runs.
+    """
+    def __init__(self, content, path: str, **kwargs):
+        super().__init__(content, **kwargs)
+        self.path = path
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            _remove_file(self.path)
+
+@router.post("/session/{session_id}/upload")
+async def upload_session_video(session_id: str, video: UploadFile = File(...), landmarks: UploadFile = File(...)):
+    """Score a recorded video with its landmark track, streaming NDJSON progress and rep events"""
+    try:
+        landmark_track = json.loads(await landmarks.read())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Landmark track is not valid JSON")
+
+    # OpenCV and the worker processes need the video on disk
+    suffix = os.path.splitext(video.filename or "")[1] or ".mp4"
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            await asyncio.to_thread(shutil.copyfileobj, video.file, out)
+    except BaseException:
+        _remove_file(path)
+        raise
+
+    async def stream():
+        try:
+            async for event in process_upload(path, landmark_track):
+                event["session_id"] = session_id
+                yield json.dumps(event, default=str) + "\n"
+        except ValueError as e:
+            yield json.dumps({"type": "error", "session_id": session_id, "data": {"message": str(e)}}) + "\n"
+
+    return _TempFileStreamingResponse(stream(), path, media_type="application/x-ndjson")
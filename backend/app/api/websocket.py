@@ -1,7 +1,20 @@
+from typing import Any, Dict
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from ..services import WallBallAnalyzer, RepTracker
+from ..core.config import settings
+from ..core.security import is_admin
+from ..services.admission import admission
+from ..services.broadcast import broadcaster
+from ..services.calibration import calibration_store
+from ..services.leaderboard import leaderboard
+from ..services.profiler import profiler
+from ..services.tuning import load_profile
+from ..services.utils import landmark_frames_to_array
+from ..services.workers import analysis_pool
 from ..models import Pose, Point3D, BallPosition
+import asyncio
 import json
+import time
 import numpy as np
 import cv2
 
@@ -15,83 +28,284 @@ sessions = {}
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     await websocket.accept()
     
-    # Initialize with caching
-    analyzer = WallBallAnalyzer()
-    tracker = RepTracker(analyzer)
-    frame_cache = {}  # Cache for frame processing
+    try:
+        priority = int(websocket.query_params.get("priority", 0))
+    except ValueError:
+        await websocket.close(code=1008, reason="priority must be an integer")
+        return
+    # A priority session is never shed first, so only the operator may ask for one
+    if priority and not is_admin(websocket.headers.get("x-admin-token")):
+        await websocket.close(code=1008, reason="priority requires the admin token")
+        return
+    priority = admission.clamp_priority(priority)
     
-    connections[session_id] = websocket
-    sessions[session_id] = {
-        "analyzer": analyzer,
-        "tracker": tracker,
-        "frame_cache": frame_cache
-    }
+    # Fast reject when this worker is at capacity
+    if not admission.admit():
+        await websocket.send_json({
+            "type": "rejected",
+            "data": {"reason": "server at capacity", "retry_after": admission.retry_after}
+        })
+        await websocket.close(code=1013)
+        return
     
+    # Everything after admit() runs inside the try so the slot is always released
     try:
+        # Initialize with caching
+        frame_cache = {}  # Cache for frame processing
+        connections[session_id] = websocket
+        
+        if analysis_pool.running:
+            # Tracker state lives on the session's analysis worker
+            worker_session = analysis_pool.open_session(session_id)
+            sessions[session_id] = {
+                "worker_session": worker_session,
+                "frame_cache": frame_cache,
+                "priority": priority
+            }
+        else:
+            analyzer = WallBallAnalyzer()
+            camera_profile = websocket.query_params.get("camera_profile")
+            if camera_profile:
+                profile = await asyncio.to_thread(load_profile, camera_profile)
+                if profile is not None:
+                    analyzer.apply_ball_detection_profile(profile)
+            tracker = RepTracker(analyzer)
+        
+            # Fixed cameras and returning athletes start from their stored calibration
+            camera_id = websocket.query_params.get("camera_id")
+            athlete_id = websocket.query_params.get("athlete_id")
+            if camera_id:
+                calibration = await asyncio.to_thread(calibration_store.load, camera_id, athlete_id)
+                if calibration is not None:
+                    tracker.apply_calibration(calibration)
+        
+            sessions[session_id] = {
+                "analyzer": analyzer,
+                "tracker": tracker,
+                "frame_cache": frame_cache,
+                "priority": priority,
+                "camera_id": camera_id,
+                "athlete_id": athlete_id
+            }
+        
         while True:
             data = await websocket.receive_json()
             
             if data["type"] == "pose":
                 # Frame skipping (only if frame_id is present)
                 frame_id = data["data"].get("frame_id")
-                if frame_id is not None and frame_id % 3 != 0:  # Process every 3rd frame
+                if frame_id is not None and frame_id % admission.decimation(priority) != 0:
                     continue
                 
-                # Process pose data with caching
+                # Resend the encoded analysis of a repeated frame instead of reprocessing it
                 if frame_id is not None and frame_id in frame_cache:
-                    result = frame_cache[frame_id]
-                else:
-                    # Process landmarks
-                    landmarks = [Point3D(**lm) for lm in data["data"]["landmarks"]]
-                    
-                    # Process ball detection if frame data is available
-                    ball_position = None
-                    if "frame" in data["data"]:
-                        frame = np.array(data["data"]["frame"])
-                        ball_detection = analyzer.detect_ball(frame)
-                        if ball_detection:
-                            ball_position = ball_detection
-                    
-                    pose = Pose(
-                        landmarks=landmarks,
-                        timestamp=data["data"]["timestamp"]
-                    )
-                    
-                    # Get image height for calculations
-                    image_height = data["data"].get("image_height", 720)
+                    await websocket.send_text(frame_cache[frame_id])
+                    continue
+                admission.record_frame()
+                
+                with profiler.session(session_id):
+                    if analysis_pool.running:
+                        result = await analysis_pool.analyze(
+                            worker_session, data["data"], admission.ball_detection_enabled(priority)
+                        )
+                        if result is None:  # Worker backlog full, drop the frame
+                            continue
+                        admission.record_cost(result["cost"])
+                    else:
+                        started = time.perf_counter()
+                        
+                        # Process landmarks
+                        landmarks = [Point3D(**lm) for lm in data["data"]["landmarks"]]
+                        
+                        # Process ball detection if frame data is available
+                        ball_position = None
+                        if "frame" in data["data"] and admission.ball_detection_enabled(priority):
+                            frame = np.array(data["data"]["frame"], dtype=np.uint8)
+                            ball_detection = analyzer.detect_ball(frame)
+                            if ball_detection:
+                                ball_position = ball_detection
+                        
+                        pose = Pose(
+                            landmarks=landmarks,
+                            timestamp=data["data"]["timestamp"]
+                        )
+                        
+                        # Get image height for calculations
+                        image_height = data["data"].get("image_height", 720)
+                        
+                        # Update tracker with pose and ball position
+                        result = tracker.update(pose, image_height, ball_position, data["data"].get("image_width"))
+                        result["ball_position"] = ball_position
+                        admission.record_cost(time.perf_counter() - started)
                     
-                    # Update tracker with pose and ball position
-                    result = tracker.update(pose, image_height, ball_position)
+                    # Encode once for the athlete and every subscriber
+                    message = json.dumps({
+                        "type": "analysis",
+                        "session_id": session_id,
+                        "data": _analysis_data(result)
+                    })
                     
+                    # Cache the encoded message only; results hold references into tracker state
                     if frame_id is not None:
-                        frame_cache[frame_id] = result
+                        frame_cache[frame_id] = message
+                        if len(frame_cache) > settings.frame_cache_size:
+                            frame_cache.pop(min(frame_cache.keys()))
+                await websocket.send_text(message)
+                broadcaster.publish(broadcaster.session_topic(session_id), message)
+                leaderboard.update_session(session_id, result["stats"])
                 
-                # Clean up old cache entries
-                if len(frame_cache) > 30:  # Keep last 30 frames
-                    frame_cache.pop(min(frame_cache.keys()))
+            elif data["type"] == "pose_batch":
+                # K consecutive frames in one message, answered with one aggregated analysis
+                if len(data["data"]["frames"]) > settings.max_batch_frames:
+                    await websocket.close(code=1009, reason=f"pose_batch is limited to {settings.max_batch_frames} frames")
+                    break
+                decimation = admission.decimation(priority)
+                frames = [
+                    frame for frame in data["data"]["frames"]
+                    if frame.get("frame_id") is None or frame["frame_id"] % decimation == 0
+                ]
+                if not frames:
+                    continue
+                admission.record_frame(len(frames))
                 
-                # Send response with all relevant data
-                await websocket.send_json({
-                    "type": "analysis",
-                    "data": {
-                        "phase": result["phase"],
-                        "angle": result.get("knee_angle"),
-                        "stats": result["stats"],
-                        "state": result.get("state_machine", {}).get("state"),
-                        "feedback": result.get("state_machine", {}).get("feedback", []),
-                        "confidence": result.get("state_machine", {}).get("form_validation", {}).get("confidence"),
-                        "ball_detected": result.get("ball_position") is not None,
-                        "ball_height": result.get("ball_position", [0, 0, 0])[1] if result.get("ball_position") else None,
-                        "knee_angle": result.get("state_machine", {}).get("angles", {}).get("knee"),
-                        "hip_angle": result.get("state_machine", {}).get("angles", {}).get("hip"),
-                        "ankle_angle": result.get("state_machine", {}).get("angles", {}).get("ankle"),
-                        "side": result.get("state_machine", {}).get("selected_side"),
-                        "rep_count": result.get("state_machine", {}).get("squat_count"),
-                        "rep_valid": result.get("rep_completed", False),
-                        "rep_errors": result.get("state_machine", {}).get("form_validation", {}).get("errors", [])
-                    }
-                })
+                with profiler.session(session_id):
+                    if analysis_pool.running:
+                        # Workers step one frame per record; results stay in frame order per session
+                        results = [
+                            result for result in await analysis_pool.analyze_batch(
+                                worker_session, frames, admission.ball_detection_enabled(priority)
+                            )
+                            if result is not None
+                        ]
+                        if not results:
+                            continue
+                        admission.record_cost(sum(r["cost"] for r in results))
+                    else:
+                        started = time.perf_counter()
+                        ball_positions = []
+                        for frame in frames:
+                            ball_position = None
+                            if "frame" in frame and admission.ball_detection_enabled(priority):
+                                ball_position = analyzer.detect_ball(np.array(frame["frame"], dtype=np.uint8))
+                            ball_positions.append(ball_position)
+                        
+                        landmarks, counts = landmark_frames_to_array(frames)
+                        default_height = data["data"].get("image_height", 720)
+                        default_width = data["data"].get("image_width")
+                        results = tracker.update_batch(
+                            landmarks,
+                            counts,
+                            [frame["timestamp"] for frame in frames],
+                            [frame.get("image_height", default_height) for frame in frames],
+                            ball_positions,
+                            [frame.get("image_width", default_width) for frame in frames]
+                        )
+                        for result, ball_position in zip(results, ball_positions):
+                            result["ball_position"] = ball_position
+                        admission.record_cost(time.perf_counter() - started)
+                    
+                    result = results[-1]
+                    batch_data = _analysis_data(result)
+                    batch_data.update({
+                        "frames": len(results),
+                        "first_frame_id": frames[0].get("frame_id"),
+                        "last_frame_id": frames[-1].get("frame_id"),
+                        "ball_detected": any(r.get("ball_position") is not None for r in results),
+                        "rep_valid": any(r.get("rep_completed", False) for r in results),
+                        "reps": [r["rep_data"].model_dump(mode="json") for r in results if r.get("rep_data") is not None],
+                        "rep_updates": [r["rep_update"] for r in results if r.get("rep_update") is not None]
+                    })
+                    del batch_data["rep_update"]
+                    message = json.dumps({
+                        "type": "analysis",
+                        "session_id": session_id,
+                        "data": batch_data
+                    })
+                await websocket.send_text(message)
+                broadcaster.publish(broadcaster.session_topic(session_id), message)
+                leaderboard.update_session(session_id, result["stats"])
                 
     except WebSocketDisconnect:
+        pass
+    finally:
         connections.pop(session_id, None)
-        sessions.pop(session_id, None)
\ No newline at end of file
+        session = sessions.pop(session_id, None)
+        if session is not None and "worker_session" in session and analysis_pool.running:
+            analysis_pool.close_session(session["worker_session"])
+        admission.release()
+        
+        # Store the calibration refined over this session for the next one
+        if session is not None and session.get("camera_id"):
+            await asyncio.to_thread(
+                calibration_store.save, session["camera_id"], session["athlete_id"], session["tracker"].calibration()
+            )
+
+def _analysis_data(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Client-facing analysis fields for one tracker result"""
+    state_machine = result.get("state_machine", {})
+    return {
+        "phase": result["phase"],
+        "angle": result.get("knee_angle"),
+        "stats": result["stats"],
+        "state": state_machine.get("state"),
+        "feedback": state_machine.get("feedback", []),
+        "confidence": state_machine.get("form_validation", {}).get("confidence"),
+        "ball_detected": result.get("ball_position") is not None,
+        "ball_height": result.get("ball_position", [0, 0, 0])[1] if result.get("ball_position") else None,
+        "knee_angle": state_machine.get("angles", {}).get("knee"),
+        "hip_angle": state_machine.get("angles", {}).get("hip"),
+        "ankle_angle": state_machine.get("angles", {}).get("ankle"),
+        "side": state_machine.get("selected_side"),
+        "rep_count": state_machine.get("squat_count"),
+        "rep_valid": result.get("rep_completed", False),
+        "rep_update": result.get("rep_update"),
+        "rep_errors": state_machine.get("form_validation", {}).get("errors", [])
+    }
+
+async def _forward_to_subscriber(websocket: WebSocket, subscriber) -> None:
+    """Send queued messages to one viewer until it disconnects or falls too far behind"""
+    try:
+        while True:
+            message = await subscriber.queue.get()
+            if subscriber.overrun:
+                await websocket.close(code=1013, reason="Subscriber too slow")
+                return
+            await websocket.send_text(message)
+            subscriber.dropped = 0
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+
+async def _serve_subscriber(websocket: WebSocket, subscriber) -> None:
+    """Forward a subscriber's messages until the viewer disconnects"""
+    sender = asyncio.create_task(_forward_to_subscriber(websocket, subscriber))
+    try:
+        # Viewers don't send anything; wait for the disconnect
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    finally:
+        sender.cancel()
+        broadcaster.unsubscribe(subscriber)
+
+@router.websocket("/ws/subscribe")
+async def subscribe_endpoint(websocket: WebSocket):
+    """Follow live analysis for the sessions listed in ?sessions=a,b"""
+    await websocket.accept()
+    
+    session_ids = [s for s in websocket.query_params.get("sessions", "").split(",") if s]
+    subscriber = broadcaster.subscribe([broadcaster.session_topic(s) for s in session_ids])
+    await _serve_subscriber(websocket, subscriber)
+
+@router.websocket("/ws/heat/{heat_id}")
+async def heat_endpoint(websocket: WebSocket, heat_id: str):
+    """Follow a heat leaderboard: a full snapshot, then rank changes only"""
+    await websocket.accept()
+    
+    subscriber = broadcaster.subscribe([leaderboard.topic(heat_id)])
+    await websocket.send_json({
+        "type": "standings",
+        "heat_id": heat_id,
+        "data": leaderboard.standings(heat_id) or []
+    })
+    await _serve_subscriber(websocket, subscriber)
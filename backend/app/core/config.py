@@ -0,0 +1,40 @@
+import os
+
+class Settings:
+    """Runtime settings read from the environment"""
+    def __init__(self):
+        # Uploaded video processing
+        self.upload_chunk_seconds = float(os.getenv("UPLOAD_CHUNK_SECONDS", "20"))
+        self.upload_workers = int(os.getenv("UPLOAD_WORKERS", str(os.cpu_count() or 1)))
+
+        # Per-session memory
+        self.rep_history_limit = int(os.getenv("REP_HISTORY_LIMIT", "50"))
+        self.frame_cache_size = int(os.getenv("FRAME_CACHE_SIZE", "30"))
+        self.max_batch_frames = int(os.getenv("MAX_BATCH_FRAMES", "64"))
+
+        # Admission control (per worker process)
+        self.max_sessions = int(os.getenv("MAX_SESSIONS", "200"))
+        self.max_load = float(os.getenv("MAX_LOAD", "0.8"))  # Busy fraction of the analyzing processes
+        self.frame_decimation = int(os.getenv("FRAME_DECIMATION", "3"))
+        self.admission_retry_after = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+
+        # Sharded analysis workers (0 analyzes in the API process)
+        self.analysis_workers = int(os.getenv("ANALYSIS_WORKERS", "0"))
+        self.analysis_ring_capacity = int(os.getenv("ANALYSIS_RING_CAPACITY", "64"))
+        self.analysis_frame_bytes = int(os.getenv("ANALYSIS_FRAME_BYTES", str(320 * 240 * 3)))
+        self.analysis_result_timeout = float(os.getenv("ANALYSIS_RESULT_TIMEOUT", "2"))
+
+        # Live result subscribers
+        self.subscriber_buffer = int(os.getenv("SUBSCRIBER_BUFFER", "32"))
+        self.subscriber_max_dropped = int(os.getenv("SUBSCRIBER_MAX_DROPPED", "256"))
+
+        # Tuned ball detection profiles per camera/gym
+        self.ball_profile_dir = os.getenv("BALL_PROFILE_DIR", "profiles")
+
+        # Calibration profiles per camera/lane and athlete
+        self.calibration_dir = os.getenv("CALIBRATION_DIR", "calibration")
+
+        # Admin endpoints are disabled unless a token is set
+        self.admin_token = os.getenv("ADMIN_TOKEN", "")
+
+settings = Settings()
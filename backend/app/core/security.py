@@ -0,0 +1,15 @@
+import hmac
+from typing import Optional
+from fastapi import Header, HTTPException
+from .config import settings
+
+def is_admin(token: Optional[str]) -> bool:
+    """Whether a token matches the configured ADMIN_TOKEN (never true when it is unset)"""
+    return bool(settings.admin_token) and token is not None and hmac.compare_digest(token, settings.admin_token)
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Allow admin endpoints only with the configured ADMIN_TOKEN; disabled when it is unset"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
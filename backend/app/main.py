@@ -1,6 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .api import websocket
+from .api import websocket, routes
+from .core.config import settings
+from .services.video import shutdown_executor
+from .services.workers import analysis_pool
 
 # Create FastAPI app
 app = FastAPI(title="Wall Ball Referee API")
@@ -16,6 +19,17 @@ app.add_middleware(
 
 # Include routers
 app.include_router(websocket.router)
+app.include_router(routes.router)
+
+@app.on_event("startup")
+async def startup():
+    if settings.analysis_workers > 0:
+        analysis_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    shutdown_executor()
+    await analysis_pool.stop()
 
 @app.get("/")
 async def root():
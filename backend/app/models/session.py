@@ -10,6 +10,11 @@ class RepData(BaseModel):
     duration: float
     errors: List[str]
     timestamp: datetime
+    descent_time: Optional[float] = None
+    ascent_time: Optional[float] = None
+    time_under_load: Optional[float] = None
+    throw_time: Optional[float] = None
+    cycle_time: Optional[float] = None
 
 class SessionData(BaseModel):
     session_id: str
@@ -0,0 +1,107 @@
+import time
+from typing import Dict, Any
+from ..core.config import settings
+
+class AdmissionController:
+    """Caps concurrent sessions and sheds per-session work when analysis load exceeds the budget.
+
+    Load is the measured analysis time per second of wall time, divided by the number
+    of analyzing processes, so a frame counts at what it really cost (ball detection
+    included). The shed level rises one step per second while load is over max_load
+    and falls one step per second once it drops below recover_ratio of it.
+    Load is also re-measured on admit(), so an idle worker recovers even when no
+    admitted session is left to send frames.
+    Each session degrades at (shed level - priority): ball detection is disabled at 1,
+    and decimation is multiplied by the remaining level from 2 upwards.
+    """
+    max_shed_level = 4
+    recover_ratio = 0.7
+
+    def __init__(self, max_sessions: int, max_load: float, capacity: int, base_decimation: int, retry_after: int):
+        self.max_sessions = max_sessions
+        self.max_load = max_load
+        self.capacity = capacity
+        self.base_decimation = base_decimation
+        self.retry_after = retry_after
+
+        self.active_sessions = 0
+        self.shed_level = 0
+
+        # Frame rate and load over one-second windows
+        self.window_start = time.monotonic()
+        self.window_frames = 0
+        self.window_cost = 0.0
+        self.frame_rate = 0.0
+        self.load = 0.0
+
+    def admit(self) -> bool:
+        """Reserve a session slot, returning False if the worker is full or fully shed"""
+        self._update_rate(time.monotonic())
+        if self.active_sessions >= self.max_sessions or self.shed_level >= self.max_shed_level:
+            return False
+        self.active_sessions += 1
+        return True
+
+    def release(self) -> None:
+        """Free a session slot"""
+        self.active_sessions = max(0, self.active_sessions - 1)
+
+    def record_frame(self, count: int = 1) -> None:
+        """Count received frames and update the shed level once per second"""
+        self.window_frames += count
+        self._update_rate(time.monotonic())
+
+    def record_cost(self, seconds: float) -> None:
+        """Add measured analysis time for frames counted by record_frame"""
+        self.window_cost += seconds
+
+    def _update_rate(self, now: float) -> None:
+        elapsed = now - self.window_start
+        if elapsed < 1.0:
+            return
+
+        self.frame_rate = self.window_frames / elapsed
+        self.load = self.window_cost / (elapsed * self.capacity)
+        self.window_start = now
+        self.window_frames = 0
+        self.window_cost = 0.0
+
+        if self.load > self.max_load:
+            self.shed_level = min(self.max_shed_level, self.shed_level + 1)
+        elif self.load < self.max_load * self.recover_ratio:
+            # One step per elapsed second, so a long quiet window recovers fully
+            self.shed_level = max(0, self.shed_level - int(elapsed))
+
+    def _degradation(self, priority: int) -> int:
+        return max(0, self.shed_level - priority)
+
+    def clamp_priority(self, priority: int) -> int:
+        """Priorities past max_shed_level would never be shed"""
+        return min(max(0, priority), self.max_shed_level)
+
+    def ball_detection_enabled(self, priority: int) -> bool:
+        """Whether a session of this priority may still run ball detection"""
+        return self._degradation(priority) < 1
+
+    def decimation(self, priority: int) -> int:
+        """Process every Nth frame for a session of this priority"""
+        return self.base_decimation * max(1, self._degradation(priority))
+
+    def status(self) -> Dict[str, Any]:
+        """Current load and limits"""
+        return {
+            "active_sessions": self.active_sessions,
+            "max_sessions": self.max_sessions,
+            "frame_rate": round(self.frame_rate, 1),
+            "load": round(self.load, 2),
+            "max_load": self.max_load,
+            "shed_level": self.shed_level
+        }
+
+admission = AdmissionController(
+    max_sessions=settings.max_sessions,
+    max_load=settings.max_load,
+    capacity=max(1, settings.analysis_workers),
+    base_decimation=settings.frame_decimation,
+    retry_after=settings.admission_retry_after
+)
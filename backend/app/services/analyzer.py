@@ -7,6 +7,16 @@ import time
 
 class WallBallAnalyzer:
     """Core analysis logic for Wall Ball movements"""
+    # Body segments checked by the plausibility gate, shared by all sessions
+    segment_names = ('left hip-knee', 'right hip-knee', 'shoulder width', 'hip width', 'ankle distance')
+    segment_starts = np.array([23, 24, 11, 23, 27])
+    segment_ends = np.array([25, 26, 12, 24, 28])
+    # Limits are ratios to the torso (mid-shoulder to mid-hip, about 0.5m) in pixel
+    # space, so they hold at any resolution or distance. 2D projection only shortens
+    # segments, so widths have no lower bound.
+    segment_min = np.array([0.25, 0.25, 0.0, 0.0, 0.0])
+    segment_max = np.array([2.0, 2.0, 2.0, 1.2, 1.6])
+
     def __init__(self):
         # Calibration parameters
         self.calibrated = False
@@ -27,10 +37,19 @@ class WallBallAnalyzer:
         }
         self.frame_count = 0
         self.ball_detection_interval = 10  # Process every 10th frame
+        self.full_frame_scan_interval = 10  # Every 10th detection ignores the ball region
 
         # Reference values
         self.reference_height = None
         self.threshold_y = None
+        self.calibration_smoothing = 0.05  # Running average weight of each standing frame
+        
+        # Ball detection region from a stored calibration, and the ball centers seen this session,
+        # as x0, y0, x1, y1 fractions of the frame size so they hold at any resolution
+        self.ball_roi: Optional[Tuple[float, float, float, float]] = None
+        self.ball_bounds: Optional[Tuple[float, float, float, float]] = None
+        self.ball_detections = 0
+        self.min_roi_detections = 5
         
         # Debug logging
         self.last_debug_time = 0
@@ -54,6 +73,16 @@ class WallBallAnalyzer:
             'ankle': None
         }
 
+        # Plausibility gate: body segments checked in one array operation
+        self.plausibility_visibility = 0.5
+        self.max_rejected_frames = 5  # Stop trusting a check after this many rejections in a row
+        self.position_jump_interval = 100.0  # ms max_position_jump applies to (every 3rd frame at 30 fps)
+        self.default_aspect_ratio = 16 / 9  # Used when the client doesn't send the frame width
+        self.segment_rejections = 0
+        self.previous_landmarks = None
+        self.previous_timestamp = None
+        self.rejected_frames = 0
+
     def _log_detected_points(self, pose: Pose) -> None:
         """Log detected points with their visibility scores"""
         current_time = time.time()
@@ -139,7 +168,26 @@ class WallBallAnalyzer:
             self.frame_count += 1
             return None
 
+        full_scan = (self.frame_count // self.ball_detection_interval) % self.full_frame_scan_interval == 0
         self.frame_count += 1
+        height, width = frame.shape[:2]
+        
+        # Only search where the ball has been seen on this camera before, plus everything up
+        # to the throw line; a periodic full-frame pass keeps the region from locking in
+        x0 = y0 = 0
+        if self.ball_roi is not None and not full_scan:
+            margin = 2 * self.ball_detection_params['max_radius']
+            top = self.ball_roi[1] * height
+            if self.threshold_y is not None:
+                top = min(top, self.threshold_y)
+            else:
+                top = 0
+            x0 = max(0, int(self.ball_roi[0] * width - margin))
+            y0 = max(0, int(top - margin))
+            frame = frame[y0:int(self.ball_roi[3] * height + margin), x0:int(self.ball_roi[2] * width + margin)]
+            if frame.size == 0:
+                return None
+        
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         gray = cv2.medianBlur(gray, 5)
         
@@ -157,9 +205,33 @@ class WallBallAnalyzer:
             circles = np.uint16(np.around(circles))
             # Take the largest circle
             circle = max(circles[0, :], key=lambda c: c[2])
-            return circle[0], circle[1], circle[2] * 2  # center_x, center_y, diameter
+            x, y = int(circle[0]) + x0, int(circle[1]) + y0
+            self._observe_ball(x / width, y / height)
+            return x, y, int(circle[2]) * 2  # center_x, center_y, diameter
         return None
 
+    def _observe_ball(self, x: float, y: float) -> None:
+        """Grow the bounds of ball centers seen this session (fractions of the frame size)"""
+        bounds = self.ball_bounds
+        if bounds is None:
+            self.ball_bounds = (x, y, x, y)
+        else:
+            self.ball_bounds = (min(bounds[0], x), min(bounds[1], y), max(bounds[2], x), max(bounds[3], y))
+        self.ball_detections += 1
+
+    def learned_ball_roi(self) -> Optional[Tuple[float, float, float, float]]:
+        """Stored ball region widened by this session's detections, once there are enough of them"""
+        bounds = self.ball_bounds if self.ball_detections >= self.min_roi_detections else None
+        if bounds is None or self.ball_roi is None:
+            return bounds or self.ball_roi
+        roi = self.ball_roi
+        return min(roi[0], bounds[0]), min(roi[1], bounds[1]), max(roi[2], bounds[2]), max(roi[3], bounds[3])
+
+    def apply_ball_detection_profile(self, profile: Dict) -> None:
+        """Use tuned Hough parameters and detection interval from a camera/gym profile"""
+        self.ball_detection_params = {**self.ball_detection_params, **profile['ball_detection_params']}
+        self.ball_detection_interval = int(profile.get('ball_detection_interval', self.ball_detection_interval))
+
     def calculate_person_height(self, pose: Pose, image_height: int) -> Optional[int]:
         """Calculate person height in pixels"""
         landmarks = pose.landmarks
@@ -183,6 +255,28 @@ class WallBallAnalyzer:
                 ankle_y = int(ankle.y * image_height)
                 self.threshold_y = ankle_y - int(1.5 * self.reference_height)
 
+    def refine_reference_height(self, landmarks: np.ndarray, image_height: int) -> None:
+        """Fold a standing frame's (33, 4) landmarks into the reference height and throw line"""
+        if len(landmarks) < 33:
+            return
+        
+        nose_y = float(landmarks[0, 1]) * image_height  # NOSE
+        ankle_y = float(landmarks[27, 1]) * image_height  # LEFT_ANKLE
+        height = abs(ankle_y - nose_y)
+        if not height:
+            return
+        
+        threshold_y = ankle_y - 1.5 * height
+        if self.reference_height is None or self.threshold_y is None:
+            self.reference_height = height
+            self.threshold_y = threshold_y
+        else:
+            # Running average so a stored calibration follows small camera or athlete changes
+            weight = self.calibration_smoothing
+            self.reference_height += weight * (height - self.reference_height)
+            self.threshold_y += weight * (threshold_y - self.threshold_y)
+        self.calibrated = True
+
     def check_ball_throw(self, ball_position: Tuple[int, int, int], image_height: int) -> bool:
         """Check if ball is above threshold height"""
         if not self.threshold_y:
@@ -251,6 +345,66 @@ class WallBallAnalyzer:
         
         return True, "Movement continuous"
 
+    def check_pose_plausibility(self, landmarks: np.ndarray, image_height: int,
+                                image_width: Optional[int] = None, timestamp: Optional[float] = None) -> Tuple[bool, str]:
+        """Reject ghost or misdetected poses from an (33, 4) landmark array.
+
+        Segment lengths are measured in pixels and divided by the torso length, so
+        the limits don't depend on resolution or distance to the camera.
+        Frame-to-frame displacement of every landmark is checked against
+        max_position_jump in normalized image coordinates, scaled up by the time
+        since the last accepted frame (timestamp, in ms) so decimated and shed
+        sessions aren't held to a per-frame limit. Only landmarks above
+        plausibility_visibility take part in either check. Either check lets
+        frames through after max_rejected_frames rejections in a row, so a camera
+        the limits don't fit degrades the gate instead of blocking the session.
+        """
+        if landmarks.shape[0] < 33:
+            return False, "Insufficient landmarks detected"
+
+        if image_width is None:
+            image_width = image_height * self.default_aspect_ratio
+        # MediaPipe z is on a different, rougher scale, so only x and y are used
+        coords = landmarks[:, :2]
+        points = coords * (image_width, image_height)
+        visible = landmarks[:, 3] > self.plausibility_visibility
+
+        # Segment lengths for all checked pairs at once, relative to the torso
+        if visible[[11, 12, 23, 24]].all():
+            torso = np.linalg.norm((points[11] + points[12] - points[23] - points[24]) / 2)
+            ratios = np.linalg.norm(points[self.segment_ends] - points[self.segment_starts], axis=1) / max(torso, 1e-6)
+            checked = visible[self.segment_starts] & visible[self.segment_ends]
+            implausible = checked & ((ratios < self.segment_min) | (ratios > self.segment_max))
+            if implausible.any() or torso < 1.0:
+                self.segment_rejections += 1
+                if self.segment_rejections <= self.max_rejected_frames:
+                    if torso < 1.0:
+                        return False, "Implausible torso length"
+                    index = int(np.argmax(implausible))
+                    return False, f"Implausible {self.segment_names[index]}: {ratios[index]:.2f}x torso"
+            else:
+                self.segment_rejections = 0
+
+        # Displacement of all landmarks since the last accepted frame
+        if self.previous_landmarks is not None:
+            both_visible = visible & (self.previous_landmarks[:, 3] > self.plausibility_visibility)
+            jumps = np.linalg.norm(coords - self.previous_landmarks[:, :2], axis=1)
+            max_jump = self.max_position_jump
+            if timestamp is not None and self.previous_timestamp is not None:
+                max_jump *= max(1.0, (timestamp - self.previous_timestamp) / self.position_jump_interval)
+            jumped = both_visible & (jumps > max_jump)
+            if jumped.any():
+                self.rejected_frames += 1
+                if self.rejected_frames < self.max_rejected_frames:
+                    index = int(np.argmax(jumped))
+                    return False, f"Landmark {index} position jump too large: {jumps[index]:.2f}"
+
+        # Keep a copy: a batch frame is a view that would pin the whole batch array
+        self.previous_landmarks = landmarks.copy()
+        self.previous_timestamp = timestamp
+        self.rejected_frames = 0
+        return True, "Plausible pose"
+
     def validate_squat_movement(self, pose: Pose) -> Tuple[bool, str]:
         """Validate if the current pose represents a legitimate squat movement"""
         if not self.validate_person_detection(pose):
@@ -0,0 +1,65 @@
+import asyncio
+from typing import Dict, Iterable, Set
+from ..core.config import settings
+
+class Subscriber:
+    """Bounded outgoing buffer for one viewer"""
+    __slots__ = ('topics', 'queue', 'dropped', 'overrun')
+
+    def __init__(self, topics: Iterable[str], max_buffer: int):
+        self.topics = set(topics)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+        self.dropped = 0  # Messages dropped since the last successful send
+        self.overrun = False
+
+class Broadcaster:
+    """Fans already-encoded messages for a topic out to every subscriber.
+
+    publish() never awaits: a full subscriber buffer drops its oldest message, and a
+    subscriber that falls max_dropped messages behind is marked overrun so its
+    sender can disconnect it.
+    """
+    def __init__(self, max_buffer: int, max_dropped: int):
+        self.max_buffer = max_buffer
+        self.max_dropped = max_dropped
+        self.topics: Dict[str, Set[Subscriber]] = {}
+
+    @staticmethod
+    def session_topic(session_id: str) -> str:
+        return f"session:{session_id}"
+
+    def subscribe(self, topics: Iterable[str]) -> Subscriber:
+        subscriber = Subscriber(topics, self.max_buffer)
+        for topic in subscriber.topics:
+            self.topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        for topic in subscriber.topics:
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.topics[topic]
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self.topics
+
+    def publish(self, topic: str, message: str) -> None:
+        """Queue an encoded message for every subscriber of a topic"""
+        for subscriber in self.topics.get(topic, ()):
+            if subscriber.overrun:
+                continue
+            if subscriber.queue.full():
+                # Keep the newest state, drop the oldest
+                subscriber.queue.get_nowait()
+                subscriber.dropped += 1
+                if subscriber.dropped > self.max_dropped:
+                    # Still queue this one so a sender parked on the empty queue wakes up to disconnect
+                    subscriber.overrun = True
+            subscriber.queue.put_nowait(message)
+
+broadcaster = Broadcaster(
+    max_buffer=settings.subscriber_buffer,
+    max_dropped=settings.subscriber_max_dropped
+)
@@ -0,0 +1,93 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from ..core.config import settings
+
+# File name of the profile shared by every athlete on a camera
+CAMERA_PROFILE = "_camera"
+
+# Fields that belong to the camera rather than the athlete in front of it
+CAMERA_FIELDS = ("preferred_side", "ball_roi")
+
+def _safe_name(value: str) -> str:
+    """Client-supplied id reduced to a safe file name"""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", value)
+
+class CalibrationStore:
+    """Calibration profiles per camera/lane and per athlete on it, cached in memory and persisted as JSON.
+
+    Athlete profiles hold reference height, throw line, preferred side and ball
+    region. The camera profile holds only the side and ball region, and is the
+    fallback for athletes without a profile on that camera.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.profiles: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+        self.lock = threading.Lock()
+
+    def _path(self, camera_id: str, athlete_id: Optional[str]) -> str:
+        return os.path.join(self.directory, _safe_name(camera_id), _safe_name(athlete_id or CAMERA_PROFILE) + ".json")
+
+    def _get(self, camera_id: str, athlete_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        key = (camera_id, athlete_id or "")
+        with self.lock:
+            if key in self.profiles:
+                return self.profiles[key]
+
+        profile = None
+        path = self._path(camera_id, athlete_id)
+        if os.path.isfile(path):
+            with open(path) as f:
+                profile = json.load(f)
+
+        with self.lock:
+            return self.profiles.setdefault(key, profile)
+
+    def load(self, camera_id: str, athlete_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The athlete's profile on this camera if stored, else the camera profile"""
+        if athlete_id:
+            profile = self._get(camera_id, athlete_id)
+            if profile is not None:
+                return profile
+        return self._get(camera_id, None)
+
+    def save(self, camera_id: str, athlete_id: Optional[str], calibration: Dict[str, Any]) -> None:
+        """Merge a session's refined calibration into the camera and athlete profiles (blocking I/O)"""
+        self._merge(camera_id, None, {field: calibration.get(field) for field in CAMERA_FIELDS})
+        if athlete_id:
+            self._merge(camera_id, athlete_id, calibration)
+
+    def _merge(self, camera_id: str, athlete_id: Optional[str], fields: Dict[str, Any]) -> None:
+        stored = self._get(camera_id, athlete_id) or {}
+        profile = {
+            **stored,
+            # Keep stored values this session didn't get to measure
+            **{field: value for field, value in fields.items() if value is not None},
+            "sessions": stored.get("sessions", 0) + 1,
+            "updated": time.time()
+        }
+
+        path = self._path(camera_id, athlete_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(profile, f, indent=2)
+        os.replace(temp_path, path)
+
+        with self.lock:
+            self.profiles[(camera_id, athlete_id or "")] = profile
+
+    def delete(self, camera_id: str, athlete_id: Optional[str] = None) -> bool:
+        """Forget a stored profile; returns False if there was none"""
+        with self.lock:
+            self.profiles.pop((camera_id, athlete_id or ""), None)
+        path = self._path(camera_id, athlete_id)
+        if not os.path.isfile(path):
+            return False
+        os.remove(path)
+        return True
+
+calibration_store = CalibrationStore(settings.calibration_dir)
@@ -0,0 +1,113 @@
+import json
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+from .broadcast import broadcaster
+
+def ranking_key(session_id: str, stats: Dict[str, int]) -> Tuple[int, int, int, str]:
+    """Sort key: most wall-ball reps, then most valid squats, then fewest no-reps"""
+    no_reps = stats.get("invalid_squats", 0) + stats.get("invalid_throws", 0)
+    return (-stats.get("total_wallball_reps", 0), -stats.get("valid_squats", 0), no_reps, session_id)
+
+class Heat:
+    """Ranking of the lanes in one heat, kept sorted incrementally.
+
+    The ranking is a sorted list of keys. An update moves one key with two
+    bisections, and only the lanes between its old and new positions change rank.
+    """
+    def __init__(self, heat_id: str):
+        self.heat_id = heat_id
+        self.keys: Dict[str, Tuple[int, int, int, str]] = {}
+        self.ranking: List[Tuple[int, int, int, str]] = []
+
+    def _entry(self, rank: int) -> Dict[str, Any]:
+        wallball_reps, valid_squats, no_reps, session_id = self.ranking[rank]
+        return {
+            "session_id": session_id,
+            "rank": rank + 1,
+            "total_wallball_reps": -wallball_reps,
+            "valid_squats": -valid_squats,
+            "no_reps": no_reps
+        }
+
+    def update(self, session_id: str, stats: Dict[str, int]) -> List[Dict[str, Any]]:
+        """Move a lane to its new position and return the entries whose rank or score changed"""
+        key = ranking_key(session_id, stats)
+        old_key = self.keys.get(session_id)
+        if key == old_key:
+            return []
+
+        if old_key is None:
+            old_position = len(self.ranking)
+        else:
+            old_position = bisect_left(self.ranking, old_key)
+            del self.ranking[old_position]
+        new_position = bisect_left(self.ranking, key)
+        self.ranking.insert(new_position, key)
+        self.keys[session_id] = key
+
+        if old_key is None:
+            # Everyone below the new lane moved down one
+            changed = range(new_position, len(self.ranking))
+        else:
+            changed = range(min(old_position, new_position), max(old_position, new_position) + 1)
+        return [self._entry(rank) for rank in changed]
+
+    def remove(self, session_id: str) -> List[Dict[str, Any]]:
+        """Drop a lane and return the entries that moved up"""
+        key = self.keys.pop(session_id, None)
+        if key is None:
+            return []
+        position = bisect_left(self.ranking, key)
+        del self.ranking[position]
+        return [self._entry(rank) for rank in range(position, len(self.ranking))]
+
+    def standings(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Top lanes in rank order"""
+        count = len(self.ranking) if limit is None else min(limit, len(self.ranking))
+        return [self._entry(rank) for rank in range(count)]
+
+class Leaderboard:
+    """Registry of heats; pushes rank changes to heat subscribers"""
+    def __init__(self):
+        self.heats: Dict[str, Heat] = {}
+        self.session_heats: Dict[str, str] = {}
+
+    @staticmethod
+    def topic(heat_id: str) -> str:
+        return f"heat:{heat_id}"
+
+    def register(self, heat_id: str, session_id: str, stats: Optional[Dict[str, int]] = None) -> None:
+        """Put a session into a heat, moving it out of any previous heat"""
+        if self.session_heats.get(session_id) not in (None, heat_id):
+            self.unregister(session_id)
+        heat = self.heats.setdefault(heat_id, Heat(heat_id))
+        self.session_heats[session_id] = heat_id
+        self._publish(heat, heat.update(session_id, stats or {}))
+
+    def unregister(self, session_id: str) -> None:
+        heat_id = self.session_heats.pop(session_id, None)
+        if heat_id is None:
+            return
+        heat = self.heats[heat_id]
+        self._publish(heat, heat.remove(session_id))
+        if not heat.keys:
+            del self.heats[heat_id]
+
+    def update_session(self, session_id: str, stats: Dict[str, int]) -> None:
+        """Called whenever a session's stats may have changed"""
+        heat_id = self.session_heats.get(session_id)
+        if heat_id is None:
+            return
+        heat = self.heats[heat_id]
+        self._publish(heat, heat.update(session_id, stats))
+
+    def standings(self, heat_id: str, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        heat = self.heats.get(heat_id)
+        return heat.standings(limit) if heat is not None else None
+
+    def _publish(self, heat: Heat, changes: List[Dict[str, Any]]) -> None:
+        topic = self.topic(heat.heat_id)
+        if changes and broadcaster.has_subscribers(topic):
+            broadcaster.publish(topic, json.dumps({"type": "rank_changes", "heat_id": heat.heat_id, "data": changes}))
+
+leaderboard = Leaderboard()
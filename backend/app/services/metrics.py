@@ -0,0 +1,85 @@
+from typing import Dict, Any, List, Optional
+
+class RepMetrics:
+    """Streaming per-rep metrics with O(1) state per frame.
+
+    Timestamps are client timestamps in milliseconds; all reported times are seconds.
+    A rep starts on the first frame out of standing (s1) and ends when the state
+    machine counts it. Throw timing is measured from the rep's deepest frame to the
+    first throw detected before the next rep starts, so it may arrive after finalize().
+    """
+    __slots__ = (
+        'in_rep', 'rep_start', 'last_time', 'max_depth', 'bottom_time', 'time_under_load',
+        'errors', 'last_rep_end', 'last_bottom_time', 'throw_pending'
+    )
+
+    def __init__(self):
+        self.last_time: Optional[float] = None
+        self.last_rep_end: Optional[float] = None
+        self.last_bottom_time: Optional[float] = None
+        self.throw_pending = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self.in_rep = False
+        self.rep_start: Optional[float] = None
+        self.max_depth: Optional[float] = None
+        self.bottom_time: Optional[float] = None
+        self.time_under_load = 0.0
+        self.errors: List[str] = []
+
+    def update(self, timestamp: float, state: Optional[str], knee_angle: Optional[float], errors: List[str]) -> None:
+        """Fold one analyzed frame into the running statistics"""
+        now = timestamp / 1000.0
+        elapsed = now - self.last_time if self.last_time is not None else 0.0
+        self.last_time = now
+
+        if self.in_rep:
+            # Every frame of the rep counts, including the one that ends it and angle gaps
+            self.time_under_load += elapsed
+        elif state in ('s2', 's3'):
+            self.in_rep = True
+            self.rep_start = now
+            self.throw_pending = False
+
+        if self.in_rep:
+            if knee_angle is not None and (self.max_depth is None or knee_angle > self.max_depth):
+                self.max_depth = knee_angle
+                self.bottom_time = now
+            for error in errors:
+                if error not in self.errors:
+                    self.errors.append(error)
+
+    def discard(self) -> None:
+        """Drop the rep in progress without reporting it"""
+        self._reset()
+
+    def record_throw(self, timestamp: float) -> Optional[float]:
+        """Register a throw; returns its delay after the last finalized rep's bottom, if one is waiting"""
+        if not self.throw_pending or self.last_bottom_time is None:
+            return None
+        self.throw_pending = False
+        return timestamp / 1000.0 - self.last_bottom_time
+
+    def finalize(self, knee_angle: Optional[float]) -> Dict[str, Any]:
+        """Close the rep in progress and return its metrics"""
+        end = self.last_time
+        start = self.rep_start if self.rep_start is not None else end
+        bottom = self.bottom_time if self.bottom_time is not None else end
+        max_depth = self.max_depth if self.max_depth is not None else knee_angle
+
+        metrics = {
+            "max_depth": max_depth or 0,
+            "duration": end - start,
+            "descent_time": bottom - start,
+            "ascent_time": end - bottom,
+            "time_under_load": self.time_under_load,
+            "cycle_time": end - self.last_rep_end if self.last_rep_end is not None else None,
+            "errors": self.errors
+        }
+
+        self.last_rep_end = end
+        self.last_bottom_time = bottom
+        self.throw_pending = True
+        self._reset()
+        return metrics
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+class SamplingProfiler:
+    """Statistical profiler for the event loop thread.
+
+    A background thread reads the loop thread's current stack every interval
+    seconds and counts collapsed stacks ("file:function;..." root first), the
+    format flamegraph tools consume. Nothing is installed in the profiled thread,
+    so the cost there is the GIL time of each sample. The session handlers set
+    active_session while they process a frame, which allows filtering to one
+    session; use the session() context manager so the tag is cleared on every
+    exit path. Allocation tracking uses tracemalloc and is opt-in as it is costlier.
+    """
+    max_seconds = 60.0
+    max_allocation_sites = 20
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.active_session: Optional[str] = None
+        self.running = False
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[None]:
+        """Attribute samples taken inside the block to a session"""
+        self.active_session = session_id
+        try:
+            yield
+        finally:
+            # Cleared rather than restored: handlers interleave at awaits, so an
+            # older value may belong to a frame that has already finished
+            self.active_session = None
+
+    def _sample(self, thread_id: int, seconds: float, session_id: Optional[str], stacks: Counter) -> None:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            time.sleep(self.interval)
+            if session_id is not None and self.active_session != session_id:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                stacks[";".join(reversed(stack))] += 1
+
+    @staticmethod
+    def _allocation_sites(snapshot: tracemalloc.Snapshot, limit: int) -> List[Dict[str, Any]]:
+        return [
+            {
+                "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_bytes": stat.size,
+                "count": stat.count
+            }
+            for stat in snapshot.statistics("lineno")[:limit]
+        ]
+
+    async def profile(self, seconds: float, session_id: Optional[str] = None, allocations: bool = False) -> Dict[str, Any]:
+        """Sample the calling event loop thread for up to max_seconds"""
+        if self.running:
+            raise RuntimeError("A profile is already running")
+        self.running = True
+        seconds = min(max(seconds, self.interval), self.max_seconds)
+
+        started_tracing = allocations and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(1)
+
+        stacks: Counter = Counter()
+        sampler = threading.Thread(
+            target=self._sample,
+            args=(threading.get_ident(), seconds, session_id, stacks),
+            name="sampling-profiler",
+            daemon=True
+        )
+        try:
+            sampler.start()
+            while sampler.is_alive():
+                await asyncio.sleep(0.1)
+
+            allocation_sites = None
+            if allocations:
+                snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, tracemalloc.__file__)
+                ])
+                allocation_sites = self._allocation_sites(snapshot, self.max_allocation_sites)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            self.running = False
+
+        return {
+            "seconds": seconds,
+            "interval": self.interval,
+            "session_id": session_id,
+            "samples": sum(stacks.values()),
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+            "allocations": allocation_sites
+        }
+
+profiler = SamplingProfiler()
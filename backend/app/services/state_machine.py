@@ -1,17 +1,50 @@
 import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
 from ..models import Pose, Point3D
-from .utils import find_angle, select_best_side
+from .utils import find_angle, find_angles, select_best_side, select_best_sides
 from .thresholds import get_pro_thresholds
 
+# Thresholds are read-only, so every session shares one copy
+_THRESHOLDS = get_pro_thresholds()
+
+# Batch angle sides, with shoulder, hip, knee and ankle indices as (left, right) pairs
+_SIDE_NAMES = ('left', 'right')
+_SIDE_INDICES = ((11, 12), (23, 24), (25, 26), (27, 28))
+
+# State sequence bitfield. A rep always walks s2 -> s3 -> s2, so each step is one bit.
+SEQ_EMPTY = 0
+SEQ_S2 = 1
+SEQ_S3 = 2
+SEQ_S2_RETURN = 4
+SEQ_COMPLETE = SEQ_S2 | SEQ_S3 | SEQ_S2_RETURN
+
+# Legacy list form of each sequence for results
+_SEQUENCE_STATES = {
+    SEQ_EMPTY: (),
+    SEQ_S2: ('s2',),
+    SEQ_S2 | SEQ_S3: ('s2', 's3'),
+    SEQ_COMPLETE: ('s2', 's3', 's2')
+}
+
 class SquatStateMachine:
     """State machine for tracking squat states and counting reps"""
-    
+    __slots__ = (
+        'thresholds', 'sequence', 'current_state', 'previous_state',
+        'squat_count', 'improper_count', 'start_inactive_time', 'inactive_time',
+        'incorrect_posture', 'selected_side', 'preferred_side', 'side_frames'
+    )
+
+    side_landmarks = {
+        'left': {'shoulder': 11, 'hip': 23, 'knee': 25, 'ankle': 27, 'foot': 31},
+        'right': {'shoulder': 12, 'hip': 24, 'knee': 26, 'ankle': 28, 'foot': 32}
+    }
+
     def __init__(self):
-        self.thresholds = get_pro_thresholds()
+        self.thresholds = _THRESHOLDS
         
         # State tracking
-        self.state_sequence: List[str] = []
+        self.sequence = SEQ_EMPTY
         self.current_state: Optional[str] = None
         self.previous_state: Optional[str] = None
         
@@ -25,14 +58,16 @@ class SquatStateMachine:
         
         # Form validation
         self.incorrect_posture = False
-        self.form_feedback = []
         
-        # Side selection
+        # Side selection; a calibrated preferred side only breaks visibility ties
         self.selected_side = 'left'
-        self.side_landmarks = {
-            'left': {'shoulder': 11, 'hip': 23, 'knee': 25, 'ankle': 27, 'foot': 31},
-            'right': {'shoulder': 12, 'hip': 24, 'knee': 26, 'ankle': 28, 'foot': 32}
-        }
+        self.preferred_side: Optional[str] = None
+        self.side_frames = {'left': 0, 'right': 0}
+
+    @property
+    def state_sequence(self) -> Tuple[str, ...]:
+        """State sequence of the rep in progress"""
+        return _SEQUENCE_STATES[self.sequence]
 
     def _get_state(self, knee_angle: float) -> Optional[str]:
         """Determine squat state based on knee angle"""
@@ -51,39 +86,40 @@ class SquatStateMachine:
         """Update the state sequence for rep counting"""
         if state == 's2':
             # Add s2 if it's the first occurrence or if we have s3 and this is the second s2
-            if (('s3' not in self.state_sequence and self.state_sequence.count('s2') == 0) or
-                ('s3' in self.state_sequence and self.state_sequence.count('s2') == 1)):
-                self.state_sequence.append(state)
+            if self.sequence == SEQ_EMPTY:
+                self.sequence = SEQ_S2
+            elif self.sequence == SEQ_S2 | SEQ_S3:
+                self.sequence = SEQ_COMPLETE
         
         elif state == 's3':
             # Add s3 only if we don't have it yet and we have s2
-            if state not in self.state_sequence and 's2' in self.state_sequence:
-                self.state_sequence.append(state)
+            if self.sequence == SEQ_S2:
+                self.sequence = SEQ_S2 | SEQ_S3
 
-    def _validate_form(self, pose: Pose) -> Dict[str, Any]:
-        """Validate squat form and return feedback"""
-        landmarks = pose.landmarks
-        if len(landmarks) < 33:
-            return {'valid': False, 'feedback': ['Insufficient landmarks detected']}
-        
-        # Get landmarks for selected side
+    def _form_angles(self, landmarks: List[Point3D]) -> Dict[str, Optional[float]]:
+        """Vertical angles of the selected side's body segments"""
         side_lm = self.side_landmarks[self.selected_side]
         shoulder = landmarks[side_lm['shoulder']]
         hip = landmarks[side_lm['hip']]
         knee = landmarks[side_lm['knee']]
         ankle = landmarks[side_lm['ankle']]
         
-        # Calculate angles
-        hip_vertical_angle = find_angle(shoulder, hip)
-        knee_vertical_angle = find_angle(hip, knee)
-        ankle_vertical_angle = find_angle(knee, ankle)
+        return {
+            'hip': find_angle(shoulder, hip),
+            'knee': find_angle(hip, knee),
+            'ankle': find_angle(knee, ankle)
+        }
+
+    def _validate_form(self, angles: Dict[str, Optional[float]]) -> Dict[str, Any]:
+        """Validate squat form and return feedback"""
+        knee_vertical_angle = angles['knee']
         
         feedback = []
         form_valid = True
         
         # Knee angle validation only
         knee_thresh = self.thresholds['KNEE_THRESH']
-        if knee_thresh[0] < knee_vertical_angle < knee_thresh[1] and self.state_sequence.count('s2') == 1:
+        if knee_thresh[0] < knee_vertical_angle < knee_thresh[1] and (self.sequence & (SEQ_S2 | SEQ_S2_RETURN)) == SEQ_S2:
             feedback.append("LOWER YOUR HIPS")
         
         if knee_vertical_angle > knee_thresh[2]:
@@ -94,17 +130,26 @@ class SquatStateMachine:
         return {
             'valid': form_valid,
             'feedback': feedback,
-            'angles': {
-                'hip': hip_vertical_angle,
-                'knee': knee_vertical_angle,
-                'ankle': ankle_vertical_angle
-            }
+            'angles': angles
+        }
+
+    def _no_angle_result(self) -> Dict[str, Any]:
+        """Current state, unchanged, for a frame without a usable knee angle"""
+        return {
+            'state': self.current_state or 'no_pose',
+            'state_sequence': self.state_sequence,
+            'squat_count': self.squat_count,
+            'improper_count': self.improper_count,
+            'form_validation': {'valid': True, 'feedback': [], 'angles': {}},
+            'selected_side': self.selected_side,
+            'knee_angle': None,
+            'inactive_time': self.inactive_time
         }
 
     def update(self, pose: Pose) -> Dict[str, Any]:
         """Update state machine with new pose data"""
         # Select best side
-        self.selected_side = select_best_side(pose.landmarks)
+        self.selected_side = select_best_side(pose.landmarks, self.preferred_side)
         
         # Get landmarks for selected side
         side_lm = self.side_landmarks[self.selected_side]
@@ -141,17 +186,50 @@ class SquatStateMachine:
         
         # If still no angle, return current state without updating
         if knee_angle is None:
-            return {
-                'state': self.current_state or 'no_pose',
-                'state_sequence': self.state_sequence.copy(),
-                'squat_count': self.squat_count,
-                'improper_count': self.improper_count,
-                'form_validation': {'valid': True, 'feedback': [], 'angles': {}},
-                'selected_side': self.selected_side,
-                'knee_angle': None,
-                'inactive_time': self.inactive_time
-            }
+            return self._no_angle_result()
         
+        return self._step(knee_angle, self._form_angles(landmarks))
+
+    def batch_angles(self, landmarks: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Side selection, knee angle and form angles for a (K, 33, 4) batch in one pass.
+
+        Returns the side index per frame (0 left, 1 right, after the knee angle
+        fallback), the knee angle per frame and the hip/knee/ankle form angles as
+        a (K, 3) array. Missing angles are NaN.
+        """
+        preferred = _SIDE_NAMES.index(self.preferred_side) if self.preferred_side is not None else None
+        sides = select_best_sides(landmarks, preferred)
+        frames = np.arange(len(landmarks))
+        
+        # Angles for both sides, indexed [frame, side]; float64 math like find_angle
+        shoulder, hip, knee, ankle = (
+            landmarks[:, list(_SIDE_INDICES[part]), :2].astype(np.float64) for part in range(4)
+        )
+        knee_angles = find_angles(hip, knee, ankle)
+        form_angles = np.stack([
+            find_angles(shoulder, hip),
+            find_angles(hip, knee),
+            find_angles(knee, ankle)
+        ], axis=-1)
+        
+        # Fall back to the other side where the preferred one has no knee angle
+        other = 1 - sides
+        fallback = np.isnan(knee_angles[frames, sides]) & ~np.isnan(knee_angles[frames, other])
+        sides = np.where(fallback, other, sides)
+        
+        return sides, knee_angles[frames, sides], form_angles[frames, sides]
+
+    def update_angles(self, side: int, knee_angle: float, form_angles: np.ndarray) -> Dict[str, Any]:
+        """Update state machine with one frame's precomputed batch angles"""
+        self.selected_side = _SIDE_NAMES[side]
+        if np.isnan(knee_angle):
+            return self._no_angle_result()
+        
+        hip, knee, ankle = (None if np.isnan(a) else int(a) for a in form_angles)
+        return self._step(int(knee_angle), {'hip': hip, 'knee': knee, 'ankle': ankle})
+
+    def _step(self, knee_angle: float, angles: Dict[str, Optional[float]]) -> Dict[str, Any]:
+        """Advance states and counters from a frame's knee angle and form angles"""
         # Get current state
         self.previous_state = self.current_state
         self.current_state = self._get_state(knee_angle)
@@ -160,20 +238,21 @@ class SquatStateMachine:
         if self.current_state:
             self._update_state_sequence(self.current_state)
         
-        # Validate form
-        form_validation = self._validate_form(pose)
+        self.side_frames[self.selected_side] += 1
         
+        # Validate form
+        form_validation = self._validate_form(angles)
         # Update counters
         if self.current_state == 's1':
-            if len(self.state_sequence) == 3 and not self.incorrect_posture:
+            if self.sequence == SEQ_COMPLETE and not self.incorrect_posture:
                 self.squat_count += 1
-            elif 's2' in self.state_sequence and len(self.state_sequence) == 1:
+            elif self.sequence == SEQ_S2:
                 self.improper_count += 1
             elif self.incorrect_posture:
                 self.improper_count += 1
             
             # Reset for next rep
-            self.state_sequence = []
+            self.sequence = SEQ_EMPTY
             self.incorrect_posture = False
         
         # Update inactivity timer
@@ -187,11 +266,11 @@ class SquatStateMachine:
         if self.inactive_time >= self.thresholds['INACTIVE_THRESH']:
             self.squat_count = 0
             self.improper_count = 0
-            self.state_sequence = []
+            self.sequence = SEQ_EMPTY
         
         return {
             'state': self.current_state,
-            'state_sequence': self.state_sequence.copy(),
+            'state_sequence': self.state_sequence,
             'squat_count': self.squat_count,
             'improper_count': self.improper_count,
             'form_validation': form_validation,
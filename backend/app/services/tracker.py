@@ -1,26 +1,56 @@
-from typing import Dict, Any, Optional, Tuple
-from datetime import datetime
-from ..models import Pose, BallPosition
+from typing import Dict, Any, List, NamedTuple, Optional, Sequence, Tuple
+from collections import deque
+import sys
+import time
+import numpy as np
+from ..core.config import settings
+from ..models import Pose, BallPosition, RepData
 from .analyzer import WallBallAnalyzer
+from .metrics import RepMetrics
 from .state_machine import SquatStateMachine
+from .utils import deep_getsizeof, landmarks_to_array
+
+class RepRecord(NamedTuple):
+    """Compact record of a completed rep"""
+    rep_number: int
+    valid: bool
+    max_depth: float
+    duration: float
+    errors: List[str]
+    timestamp: float
+    descent_time: float
+    ascent_time: float
+    time_under_load: float
+    cycle_time: Optional[float]
+    throw_time: Optional[float] = None
 
 class RepTracker:
     """Tracks repetitions and validates form using Pro mode state machine"""
-    def __init__(self, analyzer: WallBallAnalyzer):
+    __slots__ = (
+        'analyzer', 'state_machine', 'metrics', 'phase', 'rep_history', 'rep_count', 'consecutive_frames',
+        'squat_completed', 'throw_completed', 'ball_above_threshold', 'stats'
+    )
+
+    # Confidence thresholds
+    visibility_threshold = 0.3
+    min_detection_confidence = 0.6
+    min_tracking_confidence = 0.5
+    consecutive_frames_threshold = 2
+    key_landmarks = (23, 24, 25, 26, 27, 28)  # Left and right hip, knee, ankle
+
+    # (base bytes, bytes per rep record) measured once, for memory_estimate()
+    _size_estimates: Optional[Tuple[int, int]] = None
+
+    def __init__(self, analyzer: WallBallAnalyzer, keep_full_history: bool = False):
         self.analyzer = analyzer
         self.state_machine = SquatStateMachine()
+        self.metrics = RepMetrics()
         
         # Legacy state for compatibility
         self.phase = "READY"
-        self.current_rep = None
-        self.previous_pose = None
-        self.rep_history = []
-        
-        # Confidence thresholds
-        self.visibility_threshold = 0.3
-        self.min_detection_confidence = 0.6
-        self.min_tracking_confidence = 0.5
-        self.consecutive_frames_threshold = 2
+        # Live sessions keep only recent reps; a scored upload needs every rep for its report
+        self.rep_history = deque(maxlen=None if keep_full_history else settings.rep_history_limit)
+        self.rep_count = 0
         self.consecutive_frames = 0
         
         # State flags
@@ -38,6 +68,62 @@ class RepTracker:
             "total_wallball_reps": 0
         }
 
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate deep bytes held by this session's tracking state.
+
+        Tables shared by every session (thresholds, class-level arrays) are not counted.
+        """
+        seen = {id(self.state_machine.thresholds)}
+        return {
+            "tracker": sys.getsizeof(self),
+            "state_machine": deep_getsizeof(self.state_machine, seen),
+            "metrics": deep_getsizeof(self.metrics, seen),
+            "rep_history": deep_getsizeof(self.rep_history, seen),
+            "stats": deep_getsizeof(self.stats, seen),
+            "analyzer": deep_getsizeof(self.analyzer, seen)
+        }
+
+    def memory_estimate(self) -> int:
+        """Cheap approximation of memory_usage() totals: a fixed base plus a fixed size per rep record.
+
+        Walking every session's object graph is too slow to do for thousands of
+        sessions on the event loop, so the sizes are measured once on a sample tracker.
+        """
+        if RepTracker._size_estimates is None:
+            sample = RepTracker(WallBallAnalyzer())
+            base = sum(sample.memory_usage().values())
+            record = RepRecord(1, True, 90.0, 1.0, [], time.time(), 0.5, 0.5, 1.0, 2.0, 1.0)
+            RepTracker._size_estimates = (base, deep_getsizeof(record))
+        base, per_rep = RepTracker._size_estimates
+        return base + len(self.rep_history) * per_rep
+
+    def apply_calibration(self, profile: Dict[str, Any]) -> None:
+        """Start from a stored calibration profile instead of warming up from scratch"""
+        analyzer = self.analyzer
+        if profile.get("ball_roi"):
+            analyzer.ball_roi = tuple(profile["ball_roi"])
+        if profile.get("preferred_side") in ("left", "right"):
+            self.state_machine.preferred_side = profile["preferred_side"]
+            self.state_machine.selected_side = profile["preferred_side"]
+        if profile.get("reference_height") and profile.get("threshold_y") is not None:
+            analyzer.reference_height = profile["reference_height"]
+            analyzer.threshold_y = profile["threshold_y"]
+            analyzer.calibrated = True
+            # A calibrated athlete doesn't need the confidence warm-up
+            self.consecutive_frames = self.consecutive_frames_threshold
+
+    def calibration(self) -> Dict[str, Any]:
+        """Calibration refined over this session, in stored profile form"""
+        analyzer = self.analyzer
+        side_frames = self.state_machine.side_frames
+        ball_roi = analyzer.learned_ball_roi()
+        return {
+            "reference_height": analyzer.reference_height,
+            "threshold_y": analyzer.threshold_y,
+            "preferred_side": max(side_frames, key=side_frames.get) if any(side_frames.values()) else self.state_machine.preferred_side,
+            "ball_roi": list(ball_roi) if ball_roi is not None else None
+        }
+
     def _create_empty_result(self) -> Dict[str, Any]:
         """Create an empty result when confidence checks fail"""
         return {
@@ -55,44 +141,123 @@ class RepTracker:
             }
         }
 
-    def update(self, pose: Pose, image_height: int, ball_position: Optional[Tuple[int, int, int]] = None) -> Dict[str, Any]:
-        """Update tracker with new pose data using Pro mode state machine"""
+    def _admit_frame(self, landmarks: np.ndarray, image_height: int, image_width: Optional[int] = None,
+                     timestamp: Optional[float] = None) -> bool:
+        """Confidence, plausibility and warm-up checks a frame must pass to reach the state machine"""
         # Focus on key landmarks for confidence calculation
-        key_landmarks = [23, 24, 25, 26, 27, 28]  # Left and right hip, knee, ankle
-        key_visibilities = []
-        
-        for idx in key_landmarks:
-            if idx < len(pose.landmarks):
-                visibility = getattr(pose.landmarks[idx], 'visibility', 1.0)
-                key_visibilities.append(visibility)
+        key_landmarks = [idx for idx in self.key_landmarks if idx < len(landmarks)]
         
         # Calculate confidence based on key landmarks only
-        avg_visibility = sum(key_visibilities) / len(key_visibilities) if key_visibilities else 0.0
+        avg_visibility = float(landmarks[key_landmarks, 3].mean()) if key_landmarks else 0.0
 
         # More lenient confidence check
-        if avg_visibility < self.min_detection_confidence and len(key_visibilities) < 4:
+        if avg_visibility < self.min_detection_confidence and len(key_landmarks) < 4:
             self.consecutive_frames = 0
-            return self._create_empty_result()
+            return False
+
+        # Drop ghost or misdetected poses before they reach the state machine
+        plausible, _ = self.analyzer.check_pose_plausibility(landmarks, image_height, image_width, timestamp)
+        if not plausible:
+            return False
 
         self.consecutive_frames += 1
-        if self.consecutive_frames < self.consecutive_frames_threshold:
+        return self.consecutive_frames >= self.consecutive_frames_threshold
+
+    def update(self, pose: Pose, image_height: int, ball_position: Optional[Tuple[int, int, int]] = None,
+               image_width: Optional[int] = None) -> Dict[str, Any]:
+        """Update tracker with new pose data using Pro mode state machine"""
+        landmarks = landmarks_to_array(pose.landmarks)
+        if not self._admit_frame(landmarks, image_height, image_width, pose.timestamp):
             return self._create_empty_result()
         
         # Update state machine
+        previous_squats = self.state_machine.squat_count
+        previous_improper = self.state_machine.improper_count
         state_machine_result = self.state_machine.update(pose)
         
+        # Standing frames keep the throw line calibrated
+        if state_machine_result.get("state") == "s1":
+            self.analyzer.refine_reference_height(landmarks, image_height)
+        
+        return self._apply_state_machine_result(
+            state_machine_result, previous_squats, previous_improper, pose.timestamp, image_height, ball_position
+        )
+
+    def update_batch(self, landmarks: np.ndarray, counts: np.ndarray, timestamps: Sequence[float],
+                     image_heights: Sequence[int], ball_positions: Sequence[Optional[Tuple[int, int, int]]],
+                     image_widths: Optional[Sequence[Optional[int]]] = None) -> List[Dict[str, Any]]:
+        """Update tracker with K consecutive frames from a (K, 33, 4) landmark array.
+
+        Side selection and all angles are computed for the whole batch at once;
+        only the state transitions are stepped frame by frame.
+        """
+        sides, knee_angles, form_angles = self.state_machine.batch_angles(landmarks)
+        
+        results = []
+        for k in range(len(landmarks)):
+            image_width = image_widths[k] if image_widths is not None else None
+            if not self._admit_frame(landmarks[k, :counts[k]], image_heights[k], image_width, timestamps[k]):
+                results.append(self._create_empty_result())
+                continue
+            
+            previous_squats = self.state_machine.squat_count
+            previous_improper = self.state_machine.improper_count
+            state_machine_result = self.state_machine.update_angles(sides[k], knee_angles[k], form_angles[k])
+            if state_machine_result.get("state") == "s1":
+                self.analyzer.refine_reference_height(landmarks[k, :counts[k]], image_heights[k])
+            results.append(self._apply_state_machine_result(
+                state_machine_result, previous_squats, previous_improper, timestamps[k], image_heights[k], ball_positions[k]
+            ))
+        return results
+
+    def _apply_state_machine_result(self, state_machine_result: Dict[str, Any], previous_squats: int, previous_improper: int,
+                                    timestamp: float, image_height: int,
+                                    ball_position: Optional[Tuple[int, int, int]]) -> Dict[str, Any]:
+        """Update stats, rep metrics and throw state from one state machine step"""
         # Update legacy stats to match state machine
         self.stats["valid_squats"] = state_machine_result["squat_count"]
         self.stats["invalid_squats"] = state_machine_result["improper_count"]
         self.stats["total_reps"] = state_machine_result["squat_count"] + state_machine_result["improper_count"]
         
-        # Process ball detection if available
+        # Fold the frame into the running rep metrics
+        form_validation = state_machine_result.get("form_validation", {})
+        form_errors = form_validation.get("feedback", []) if not form_validation.get("valid", True) else []
+        knee_angle = state_machine_result.get("knee_angle")
+        self.metrics.update(timestamp, state_machine_result.get("state"), knee_angle, form_errors)
+        
+        # Finalize the rep if the state machine just counted one
+        rep_data = None
+        squat_counted = state_machine_result["squat_count"] > previous_squats
+        if squat_counted or state_machine_result["improper_count"] > previous_improper:
+            if squat_counted:
+                self.squat_completed = True
+            
+            self.rep_count += 1
+            rep = RepRecord(
+                rep_number=self.rep_count,
+                valid=squat_counted,
+                timestamp=time.time(),
+                **self.metrics.finalize(knee_angle)
+            )
+            self.rep_history.append(rep)
+            rep_data = RepData(**rep._asdict())
+        elif state_machine_result.get("state") == "s1":
+            # Back to standing without a counted rep
+            self.metrics.discard()
+        
+        # Process ball detection if available; a throw timed to an earlier rep is sent as a rep update
+        rep_update = None
         if ball_position:
             is_throw = self.analyzer.check_ball_throw(ball_position, image_height)
             if is_throw and not self.ball_above_threshold:
                 self.throw_completed = True
                 self.ball_above_threshold = True
                 self.stats["valid_throws"] += 1
+                
+                throw_time = self.metrics.record_throw(timestamp)
+                if throw_time is not None and self.rep_history:
+                    self.rep_history[-1] = self.rep_history[-1]._replace(throw_time=throw_time)
+                    rep_update = {"rep_number": self.rep_history[-1].rep_number, "throw_time": throw_time}
             elif not is_throw:
                 self.ball_above_threshold = False
         
@@ -107,8 +272,9 @@ class RepTracker:
             "phase": self.phase,
             "knee_angle": state_machine_result.get("knee_angle"),
             "movement": state_machine_result.get("state"),
-            "rep_completed": False,
-            "rep_data": None,
+            "rep_completed": squat_counted,
+            "rep_data": rep_data,
+            "rep_update": rep_update,
             "stats": self.stats,
             "state_machine": {
                 "state": state_machine_result.get("state"),
@@ -123,23 +289,4 @@ class RepTracker:
             }
         }
         
-        # Check if a rep was completed (state machine handles this)
-        if state_machine_result.get("state") == "s1" and len(state_machine_result.get("state_sequence", [])) == 0:
-            # Rep was just completed by state machine
-            if state_machine_result.get("squat_count") > self.stats.get("valid_squats", 0):
-                self.squat_completed = True
-                result["rep_completed"] = True
-                
-                rep_data = {
-                    "rep_number": len(self.rep_history) + 1,
-                    "valid_squat": True,
-                    "max_depth": state_machine_result.get("knee_angle", 0),
-                    "duration": 0,  # State machine doesn't track duration yet
-                    "timestamp": datetime.now()
-                }
-                
-                self.rep_history.append(rep_data)
-                result["rep_data"] = rep_data
-        
-        self.previous_pose = pose
         return result
\ No newline at end of file
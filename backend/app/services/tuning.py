@@ -0,0 +1,213 @@
+"""Offline tuning of the Hough ball detector over a labelled corpus of frames.
+
+The corpus is a directory with a labels.json listing frames in capture order:
+
+    {"frames": [{"file": "0001.png", "ball": [x, y, diameter]}, {"file": "0002.png", "ball": null}, ...]}
+
+Usage:
+
+    python -m app.services.tuning corpus/ --output profiles/gym-a.json
+
+Every detector configuration is run over the corpus in a process pool; each run
+reads and decodes one frame at a time, so memory stays flat however large the
+corpus is and however many workers run. Detection
+intervals are then evaluated from the same per-frame outcomes, since an interval
+only changes which frames are sampled. The report holds recall and precision
+against CPU cost per frame, the Pareto front of those, and the cheapest
+configuration that meets the requested recall and precision as a loadable profile.
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import cv2
+from ..core.config import settings
+from .analyzer import WallBallAnalyzer
+
+DEFAULT_GRID = {
+    'dp': [1.0, 1.1, 1.3, 1.5],
+    'min_dist': [30],
+    'param1': [20, 50, 100],
+    'param2': [15, 20, 30, 40],
+    'min_radius': [10],
+    'max_radius': [100]
+}
+DEFAULT_INTERVALS = [1, 3, 5, 10, 15]
+
+# Loaded profiles by path, with the file mtime they were read at
+_profiles: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+
+def load_corpus(corpus_dir: str) -> Tuple[List[str], List[Optional[Tuple[float, float, float]]]]:
+    """Read frame paths and ball labels from a corpus directory"""
+    with open(os.path.join(corpus_dir, "labels.json")) as f:
+        labels = json.load(f)
+    paths, balls = [], []
+    for frame in labels["frames"]:
+        paths.append(os.path.join(corpus_dir, frame["file"]))
+        balls.append(tuple(frame["ball"]) if frame.get("ball") else None)
+    return paths, balls
+
+def _init_worker() -> None:
+    cv2.setNumThreads(1)  # Time each configuration on a single core
+
+def _matches(detection: Tuple[int, int, int], label: Tuple[float, float, float]) -> bool:
+    """A detection matches if its center lies within the labelled ball's radius"""
+    radius = max(label[2] / 2, 5)
+    return (detection[0] - label[0]) ** 2 + (detection[1] - label[1]) ** 2 <= radius ** 2
+
+def run_config(params: Dict[str, float], paths: List[str],
+               balls: List[Optional[Tuple[float, float, float]]]) -> Dict[str, Any]:
+    """Run one detector configuration over every corpus frame (runs in a worker process)"""
+    analyzer = WallBallAnalyzer()
+    analyzer.ball_detection_params = dict(params)
+    analyzer.ball_detection_interval = 1
+
+    outcomes = []  # 'tp', 'fp', 'fn', 'tn' per frame
+    elapsed = 0.0
+    for path, label in zip(paths, balls):
+        # Decoding is not part of the detector's cost
+        frame = cv2.imread(path)
+        if frame is None:
+            raise ValueError(f"Could not read corpus frame {path}")
+        start = time.perf_counter()
+        detection = analyzer.detect_ball(frame)
+        elapsed += time.perf_counter() - start
+
+        if detection is None:
+            outcomes.append('fn' if label is not None else 'tn')
+        elif label is not None and _matches(detection, label):
+            outcomes.append('tp')
+        else:
+            # A wrong circle while the ball is visible also misses the ball
+            outcomes.append('fp' if label is None else 'fp+fn')
+
+    return {"params": params, "outcomes": outcomes, "detect_ms": 1000.0 * elapsed / max(len(outcomes), 1)}
+
+def evaluate_interval(run: Dict[str, Any], balls: List[Optional[Tuple[float, float, float]]], interval: int) -> Dict[str, Any]:
+    """Score a configuration when detection runs on every interval-th frame"""
+    outcomes = run["outcomes"]
+    sampled = outcomes[::interval]
+    tp = sampled.count('tp')
+    fp = sum(1 for o in sampled if o.startswith('fp'))
+    fn = sum(1 for o in sampled if o.endswith('fn'))
+
+    # Throw events: runs of consecutive frames with a labelled ball
+    events = hits = 0
+    in_event = hit = False
+    for index, label in enumerate(balls + [None]):
+        if label is not None:
+            if not in_event:
+                in_event, hit = True, False
+                events += 1
+            hit = hit or (index % interval == 0 and outcomes[index] == 'tp')
+        elif in_event:
+            in_event = False
+            hits += hit
+
+    return {
+        "ball_detection_params": run["params"],
+        "ball_detection_interval": interval,
+        "precision": tp / (tp + fp) if tp + fp else 1.0,
+        "frame_recall": tp / (tp + fn) if tp + fn else 1.0,
+        "event_recall": hits / events if events else 1.0,
+        "cost_ms_per_frame": run["detect_ms"] / interval
+    }
+
+def pareto_front(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Configurations not beaten on cost, event recall and precision at once, cheapest first"""
+    def dominates(a, b):
+        better_or_equal = (
+            a["cost_ms_per_frame"] <= b["cost_ms_per_frame"] and
+            a["event_recall"] >= b["event_recall"] and
+            a["precision"] >= b["precision"]
+        )
+        strictly_better = (
+            a["cost_ms_per_frame"] < b["cost_ms_per_frame"] or
+            a["event_recall"] > b["event_recall"] or
+            a["precision"] > b["precision"]
+        )
+        return better_or_equal and strictly_better
+
+    front = [r for r in results if not any(dominates(other, r) for other in results)]
+    return sorted(front, key=lambda r: r["cost_ms_per_frame"])
+
+def tune(corpus_dir: str, grid: Dict[str, List[float]], intervals: List[int],
+         min_recall: float, min_precision: float, workers: int) -> Dict[str, Any]:
+    """Run the full grid over a corpus and build a profile report"""
+    paths, balls = load_corpus(corpus_dir)
+    keys = list(grid)
+    configs = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        runs = list(executor.map(run_config, configs, itertools.repeat(paths), itertools.repeat(balls)))
+
+    results = [evaluate_interval(run, balls, interval) for run in runs for interval in intervals]
+    front = pareto_front(results)
+    eligible = [r for r in front if r["event_recall"] >= min_recall and r["precision"] >= min_precision]
+
+    return {
+        "corpus": os.path.abspath(corpus_dir),
+        "frames": len(paths),
+        "selected": eligible[0] if eligible else None,
+        "front": front,
+        "results": results
+    }
+
+def load_profile(name: str) -> Optional[Dict[str, Any]]:
+    """Load a tuned camera/gym profile from BALL_PROFILE_DIR, or None if missing (blocking I/O).
+
+    Profiles are cached by file mtime, so new and updated profiles are picked up
+    without a restart.
+    """
+    path = os.path.join(settings.ball_profile_dir, os.path.basename(name) + ".json")
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        _profiles.pop(path, None)
+        return None
+
+    cached = _profiles.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(path) as f:
+        report = json.load(f)
+    profile = report.get("selected")
+    _profiles[path] = (mtime, profile)
+    return profile
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tune Hough ball detection over a labelled frame corpus")
+    parser.add_argument("corpus", help="Directory with labels.json and frame images")
+    parser.add_argument("--output", required=True, help="Profile report to write (JSON)")
+    parser.add_argument("--grid", help="JSON file overriding the parameter grid")
+    parser.add_argument("--intervals", type=int, nargs="+", default=DEFAULT_INTERVALS)
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Minimum throw event recall")
+    parser.add_argument("--min-precision", type=float, default=0.9)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = {**DEFAULT_GRID, **json.load(f)}
+
+    report = tune(args.corpus, grid, args.intervals, args.min_recall, args.min_precision, args.workers)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{len(report['results'])} configurations, {len(report['front'])} on the Pareto front")
+    for result in report["front"]:
+        print(
+            f"  {result['cost_ms_per_frame']:7.3f} ms/frame  recall {result['event_recall']:.2f}  "
+            f"precision {result['precision']:.2f}  interval {result['ball_detection_interval']:2d}  "
+            f"{result['ball_detection_params']}"
+        )
+    if report["selected"] is None:
+        print("No configuration meets the recall and precision targets")
+
+if __name__ == "__main__":
+    main()
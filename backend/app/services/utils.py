@@ -1,5 +1,8 @@
+import sys
+import types
+from collections import deque
 import numpy as np
-from typing import Tuple, List
+from typing import Any, Dict, Tuple, List, Optional, Set
 from ..models import Point3D
 
 def find_angle(p1: Point3D, p2: Point3D, ref_pt: Point3D = None) -> float:
@@ -36,6 +39,22 @@ def find_angle(p1: Point3D, p2: Point3D, ref_pt: Point3D = None) -> float:
     
     return int(180 / np.pi * theta)
 
+def find_angles(p1: np.ndarray, p2: np.ndarray, ref_pt: Optional[np.ndarray] = None) -> np.ndarray:
+    """Vectorized find_angle over arrays of (x, y) points; NaN where find_angle returns None"""
+    p1_ref = p1 if ref_pt is None else p1 - ref_pt
+    p2_ref = p2 if ref_pt is None else p2 - ref_pt
+    
+    p1_norm = np.linalg.norm(p1_ref, axis=-1)
+    p2_norm = np.linalg.norm(p2_ref, axis=-1)
+    valid = (p1_norm != 0) & (p2_norm != 0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos_theta = np.sum(p1_ref * p2_ref, axis=-1) / (p1_norm * p2_norm)
+    theta = np.arccos(np.clip(cos_theta, -1.0, 1.0))
+    
+    # Truncate to whole degrees like find_angle
+    return np.where(valid, np.trunc(180 / np.pi * theta), np.nan)
+
 def find_vertical_angle(point: Point3D, frame_width: int, frame_height: int) -> float:
     """Calculate vertical angle from a point to the ground"""
     # Create a reference point at the same x-coordinate but at the bottom of the frame
@@ -45,14 +64,38 @@ def find_vertical_angle(point: Point3D, frame_width: int, frame_height: int) ->
     angle = find_angle(point, ref_point)
     return angle
 
+def landmarks_to_array(landmarks: List[Point3D]) -> np.ndarray:
+    """Pack landmarks into an (N, 4) float array of x, y, z, visibility"""
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility if lm.visibility is not None else 1.0) for lm in landmarks],
+        dtype=np.float32
+    ).reshape(-1, 4)
+
+def landmark_frames_to_array(frames: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack JSON pose frames into a (K, 33, 4) array plus the landmark count of each frame"""
+    landmarks = np.zeros((len(frames), 33, 4), dtype=np.float32)
+    counts = np.zeros(len(frames), dtype=np.int32)
+    for k, frame in enumerate(frames):
+        points = [
+            (lm["x"], lm["y"], lm["z"], lm.get("visibility", 1.0) if lm.get("visibility") is not None else 1.0)
+            for lm in frame["landmarks"][:33]
+        ]
+        counts[k] = len(points)
+        if points:
+            landmarks[k, :len(points)] = points
+    return landmarks, counts
+
 def get_landmark_coordinates(landmarks: List[Point3D], indices: List[int]) -> List[Point3D]:
     """Get coordinates for specific landmark indices"""
     return [landmarks[i] for i in indices if i < len(landmarks)]
 
-def select_best_side(landmarks: List[Point3D]) -> str:
-    """Select the best side (left or right) based on visibility and position"""
+def select_best_side(landmarks: List[Point3D], preferred: Optional[str] = None) -> str:
+    """Select the best side (left or right) based on visibility and position.
+
+    A preferred side (e.g. from calibration) breaks ties when visibility is similar.
+    """
     if len(landmarks) < 33:
-        return 'left'  # Default to left
+        return preferred or 'left'  # Default to left
     
     # Define landmark indices for left and right sides
     left_side = [11, 23, 25, 27, 31]  # shoulder, hip, knee, ankle, foot
@@ -85,6 +128,9 @@ def select_best_side(landmarks: List[Point3D]) -> str:
         elif right_avg > left_avg + 0.1:
             return 'right'
     
+    if preferred is not None:
+        return preferred
+    
     # If visibility is similar or unavailable, choose based on shoulder-to-foot distance
     # (closer side to camera is better)
     left_shoulder = landmarks[11] if len(landmarks) > 11 else None
@@ -101,4 +147,51 @@ def select_best_side(landmarks: List[Point3D]) -> str:
         
         return 'left' if left_distance > right_distance else 'right'
     
-    return 'left'  # Default fallback 
\ No newline at end of file
+    return 'left'  # Default fallback 
+
+def select_best_sides(landmarks: np.ndarray, preferred: Optional[int] = None) -> np.ndarray:
+    """Vectorized select_best_side over a (K, 33, 4) batch; 0 for left, 1 for right"""
+    left_avg = landmarks[:, [11, 23, 25, 27, 31], 3].mean(axis=1)
+    right_avg = landmarks[:, [12, 24, 26, 28, 32], 3].mean(axis=1)
+    
+    # Similar visibility: the side with the longer shoulder-to-foot distance is closer to the camera
+    left_distance = np.abs(landmarks[:, 31, 1] - landmarks[:, 11, 1])
+    right_distance = np.abs(landmarks[:, 32, 1] - landmarks[:, 12, 1])
+    by_distance = np.where(left_distance > right_distance, 0, 1) if preferred is None else preferred
+    
+    return np.where(left_avg > right_avg + 0.1, 0, np.where(right_avg > left_avg + 0.1, 1, by_distance))
+
+def deep_getsizeof(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """Approximate deep size of an object graph in bytes, counting each object once.
+
+    Follows containers, instance __dict__ and __slots__, and numpy array buffers.
+    Pass ids of objects shared between sessions in seen to leave them out.
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, (type, types.ModuleType, types.FunctionType, types.MethodType)):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+
+        if isinstance(item, np.ndarray):
+            # A view's getsizeof excludes the data; count the buffer it points into
+            if item.base is not None:
+                stack.append(item.base)
+        elif isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        else:
+            if hasattr(item, '__dict__'):
+                stack.append(item.__dict__)
+            for cls in type(item).__mro__:
+                for name in getattr(cls, '__slots__', ()):
+                    if hasattr(item, name):
+                        stack.append(getattr(item, name))
+    return total
@@ -0,0 +1,201 @@
+import asyncio
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import cv2
+from ..core.config import settings
+from ..models import Pose, Point3D, RepData
+from .analyzer import WallBallAnalyzer
+from .tracker import RepTracker
+
+# Shared pool for chunked ball detection, created on first upload
+_executor: Optional[ProcessPoolExecutor] = None
+
+def get_executor() -> ProcessPoolExecutor:
+    """Get the process pool used for uploaded video processing"""
+    global _executor
+    if _executor is None:
+        # Forking a threaded asyncio process is unsafe; start workers clean, as the analysis pool does
+        _executor = ProcessPoolExecutor(max_workers=settings.upload_workers, mp_context=mp.get_context("spawn"))
+    return _executor
+
+def shutdown_executor() -> None:
+    """Stop the upload process pool if it was started"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def read_video_info(path: str) -> Tuple[int, float, int, int]:
+    """Read frame count, fps, frame width and frame height of a video file"""
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise ValueError("Could not open video file")
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)) or 1280
+        frame_height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 720
+    finally:
+        capture.release()
+    return frame_count, fps, frame_width, frame_height
+
+def split_into_chunks(frame_count: int, fps: float, chunk_seconds: float, interval: int) -> List[Tuple[int, int]]:
+    """Split a video into [start, end) frame ranges of roughly chunk_seconds each"""
+    chunk_frames = max(interval, int(fps * chunk_seconds))
+    # Align boundaries to the detection interval so chunks sample the same frames as a single pass
+    chunk_frames -= chunk_frames % interval
+    return [(start, min(start + chunk_frames, frame_count)) for start in range(0, frame_count, chunk_frames)]
+
+def detect_ball_in_chunk(path: str, start: int, end: int) -> List[Tuple[int, Tuple[int, int, int]]]:
+    """Run ball detection over frames [start, end) of a video file (runs in a worker process)"""
+    analyzer = WallBallAnalyzer()
+    analyzer.frame_count = start
+    detections = []
+
+    capture = cv2.VideoCapture(path)
+    try:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for frame_index in range(start, end):
+            if not capture.grab():
+                break
+
+            # Only decode frames the analyzer would actually run detection on
+            if analyzer.frame_count % analyzer.ball_detection_interval != 0:
+                analyzer.frame_count += 1
+                continue
+
+            ok, frame = capture.retrieve()
+            if not ok:
+                analyzer.frame_count += 1
+                continue
+
+            ball = analyzer.detect_ball(frame)
+            if ball is not None:
+                detections.append((frame_index, tuple(int(v) for v in ball)))
+    finally:
+        capture.release()
+
+    return detections
+
+def parse_landmark_track(track: Any, fps: float) -> List[Tuple[int, Dict[str, Any]]]:
+    """Normalize an uploaded landmark track into (frame_index, frame) pairs sorted by frame index"""
+    frames = track.get("frames", []) if isinstance(track, dict) else track
+    if not isinstance(frames, list):
+        raise ValueError("Landmark track must be a list of frames")
+
+    indexed = []
+    for frame in frames:
+        if not isinstance(frame, dict):
+            raise ValueError("Landmark frame must be an object")
+        if "landmarks" not in frame:
+            raise ValueError("Landmark frame is missing 'landmarks'")
+        frame_id = frame.get("frame_id")
+        if frame_id is None:
+            # Timestamps are milliseconds from the start of the video
+            frame_id = int(round(frame.get("timestamp", 0) / 1000.0 * fps))
+        indexed.append((int(frame_id), frame))
+
+    indexed.sort(key=lambda item: item[0])
+    return indexed
+
+class UploadMerger:
+    """Feeds landmark frames and chunk ball detections through a RepTracker in frame order"""
+    def __init__(self, landmark_frames: List[Tuple[int, Dict[str, Any]]], fps: float, frame_width: int, frame_height: int):
+        self.analyzer = WallBallAnalyzer()
+        self.tracker = RepTracker(self.analyzer, keep_full_history=True)
+        self.landmark_frames = landmark_frames
+        self.fps = fps
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.next_landmark = 0
+        self.frames_processed = 0
+
+    def merge(self, end: Optional[int], detections: List[Tuple[int, Tuple[int, int, int]]]) -> List[Dict[str, Any]]:
+        """Process landmark frames up to frame index end (all remaining if None) and return completed reps"""
+        reps = []
+        next_detection = 0
+
+        while self.next_landmark < len(self.landmark_frames):
+            frame_index, frame = self.landmark_frames[self.next_landmark]
+            if end is not None and frame_index >= end:
+                break
+
+            # Use the latest detection since the previous landmark frame
+            ball_position = None
+            while next_detection < len(detections) and detections[next_detection][0] <= frame_index:
+                ball_position = detections[next_detection][1]
+                next_detection += 1
+
+            pose = Pose(
+                landmarks=[Point3D(**lm) for lm in frame["landmarks"]],
+                timestamp=frame.get("timestamp", frame_index / self.fps * 1000.0)
+            )
+            image_height = frame.get("image_height", self.frame_height)
+            image_width = frame.get("image_width", self.frame_width)
+            result = self.tracker.update(pose, image_height, ball_position, image_width)
+            if result["rep_data"] is not None:
+                reps.append(result["rep_data"].model_dump(mode="json"))
+
+            self.next_landmark += 1
+            self.frames_processed += 1
+
+        return reps
+
+async def process_upload(path: str, landmark_track: Any) -> AsyncIterator[Dict[str, Any]]:
+    """Score an uploaded video, yielding progress, rep and final result events"""
+    frame_count, fps, frame_width, frame_height = read_video_info(path)
+    landmark_frames = parse_landmark_track(landmark_track, fps)
+    merger = UploadMerger(landmark_frames, fps, frame_width, frame_height)
+
+    interval = merger.analyzer.ball_detection_interval
+    chunks = split_into_chunks(frame_count, fps, settings.upload_chunk_seconds, interval)
+
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    futures = {
+        loop.run_in_executor(executor, detect_ball_in_chunk, path, start, end): index
+        for index, (start, end) in enumerate(chunks)
+    }
+
+    # Chunks finish in any order, but the tracker must see them in frame order
+    completed: Dict[int, List[Tuple[int, Tuple[int, int, int]]]] = {}
+    next_chunk = 0
+    try:
+        pending = set(futures)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                completed[futures[future]] = future.result()
+
+            while next_chunk in completed:
+                detections = completed.pop(next_chunk)
+                reps = await asyncio.to_thread(merger.merge, chunks[next_chunk][1], detections)
+                for rep in reps:
+                    yield {"type": "rep", "data": rep}
+                next_chunk += 1
+
+            yield {
+                "type": "progress",
+                "data": {
+                    "chunks_done": len(chunks) - len(pending),
+                    "chunks_total": len(chunks),
+                    "frames_processed": merger.frames_processed
+                }
+            }
+    finally:
+        for future in futures:
+            future.cancel()
+
+    # Landmark frames past the last decoded video frame
+    for rep in await asyncio.to_thread(merger.merge, None, []):
+        yield {"type": "rep", "data": rep}
+
+    yield {
+        "type": "result",
+        "data": {
+            "frames_processed": merger.frames_processed,
+            "stats": merger.tracker.stats,
+            "reps": [RepData(**rep._asdict()).model_dump(mode="json") for rep in merger.tracker.rep_history]
+        }
+    }
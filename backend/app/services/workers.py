@@ -0,0 +1,465 @@
+import asyncio
+import multiprocessing as mp
+import time
+import zlib
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+from ..models import Pose, Point3D
+from .analyzer import WallBallAnalyzer
+from .tracker import RepTracker
+
+# Record kinds on the input ring
+KIND_POSE = 0
+KIND_CLOSE = 1
+
+# Input record flags
+FLAG_BALL_DETECTION = 1
+FLAG_FRAME = 2
+
+# Compact encodings for result fields
+STATE_CODES = (None, 'no_pose', 's1', 's2', 's3')
+SIDE_CODES = ('left', 'right')
+FEEDBACK_MESSAGES = ("LOWER YOUR HIPS", "SQUAT TOO DEEP", "Insufficient landmarks detected")
+STAT_KEYS = ("total_reps", "valid_squats", "invalid_squats", "valid_throws", "invalid_throws", "total_wallball_reps")
+
+def input_dtype(frame_bytes: int) -> np.dtype:
+    """Record layout for pose frames sent to a worker"""
+    return np.dtype([
+        ('kind', 'u1'),
+        ('flags', 'u1'),
+        ('session', 'i4'),
+        ('seq', 'i8'),
+        ('timestamp', 'f8'),
+        ('image_height', 'i4'),
+        ('image_width', 'i4'),  # 0 when the client didn't send it
+        ('landmark_count', 'i4'),
+        ('landmarks', 'f4', (33, 4)),
+        ('frame_shape', 'i4', (3,)),
+        ('frame', 'u1', (max(frame_bytes, 1),))
+    ])
+
+RESULT_DTYPE = np.dtype([
+    ('session', 'i4'),
+    ('seq', 'i8'),
+    ('error', '?'),  # The worker could not analyze the record
+    ('cost', 'f4'),  # Seconds the worker spent analyzing the record
+    ('state', 'u1'),
+    ('side', 'u1'),
+    ('feedback', 'u1'),
+    ('rep_completed', '?'),
+    ('angle', 'f4'),  # NaN when no angle
+    ('knee_angle', 'f4'),
+    ('hip_angle', 'f4'),
+    ('ankle_angle', 'f4'),
+    ('rep_count', 'i4'),
+    ('throw_rep', 'i4'),  # Rep a throw was timed to this frame, 0 when none
+    ('throw_time', 'f4'),
+    ('stats', 'i4', (len(STAT_KEYS),)),
+    ('ball', 'i4', (3,))  # -1 when no ball
+])
+
+class SharedRing:
+    """Single-producer, single-consumer ring of fixed-size records in shared memory.
+
+    A 64-byte header holds the head (records written) and tail (records read)
+    counters; records follow as a numpy structured array. The producer fills a
+    reserved slot and then commits, the consumer peeks and then releases, so
+    record data is never pickled or copied through a pipe.
+    """
+    header_bytes = 64
+
+    def __init__(self, dtype: np.dtype, capacity: int, name: Optional[str] = None):
+        self.dtype = dtype
+        self.capacity = capacity
+        size = self.header_bytes + dtype.itemsize * capacity
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.counters = np.ndarray((2,), dtype=np.uint64, buffer=self.shm.buf[:16])
+        self.records = np.ndarray((capacity,), dtype=dtype, buffer=self.shm.buf[self.header_bytes:size])
+        if self.owner:
+            self.counters[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def reserve(self) -> Optional[np.void]:
+        """Slot for the next record, or None if the ring is full"""
+        head, tail = int(self.counters[0]), int(self.counters[1])
+        if head - tail >= self.capacity:
+            return None
+        return self.records[head % self.capacity]
+
+    def commit(self) -> None:
+        """Publish the reserved slot to the consumer"""
+        self.counters[0] += 1
+
+    def peek(self) -> Optional[np.void]:
+        """Oldest unread record, or None if the ring is empty"""
+        head, tail = int(self.counters[0]), int(self.counters[1])
+        if tail >= head:
+            return None
+        return self.records[tail % self.capacity]
+
+    def release(self) -> None:
+        """Hand the peeked slot back to the producer"""
+        self.counters[1] += 1
+
+    def close(self) -> None:
+        # Views must go before the buffer can be closed
+        del self.counters
+        del self.records
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def encode_result(slot: np.void, session: int, seq: int, result: Dict[str, Any], cost: float = 0.0) -> None:
+    """Pack a RepTracker result into a result record"""
+    state_machine = result.get("state_machine", {})
+    angles = state_machine.get("angles", {})
+    feedback = state_machine.get("feedback", [])
+
+    slot['session'] = session
+    slot['seq'] = seq
+    slot['error'] = False
+    slot['cost'] = cost
+    slot['state'] = STATE_CODES.index(state_machine.get("state")) if state_machine.get("state") in STATE_CODES else 0
+    slot['side'] = SIDE_CODES.index(state_machine.get("selected_side") or 'left')
+    slot['feedback'] = sum(1 << i for i, message in enumerate(FEEDBACK_MESSAGES) if message in feedback)
+    slot['rep_completed'] = result.get("rep_completed", False)
+    for field, value in (
+        ('angle', result.get("knee_angle")),
+        ('knee_angle', angles.get("knee")),
+        ('hip_angle', angles.get("hip")),
+        ('ankle_angle', angles.get("ankle"))
+    ):
+        slot[field] = np.nan if value is None else value
+    slot['rep_count'] = state_machine.get("squat_count") or 0
+    rep_update = result.get("rep_update")
+    slot['throw_rep'] = rep_update["rep_number"] if rep_update else 0
+    slot['throw_time'] = rep_update["throw_time"] if rep_update else np.nan
+    slot['stats'] = [result["stats"][key] for key in STAT_KEYS]
+    ball = result.get("ball_position")
+    slot['ball'] = ball if ball is not None else (-1, -1, -1)
+
+def decode_result(slot: np.void) -> Dict[str, Any]:
+    """Unpack a result record into the same shape RepTracker.update returns"""
+    def angle(field):
+        value = float(slot[field])
+        return None if np.isnan(value) else value
+
+    ball = slot['ball']
+    return {
+        "phase": "READY",
+        "cost": float(slot['cost']),
+        "knee_angle": angle('angle'),
+        "rep_completed": bool(slot['rep_completed']),
+        "rep_update": {"rep_number": int(slot['throw_rep']), "throw_time": float(slot['throw_time'])} if slot['throw_rep'] else None,
+        "stats": dict(zip(STAT_KEYS, (int(v) for v in slot['stats']))),
+        "ball_position": None if ball[0] < 0 else tuple(int(v) for v in ball),
+        "state_machine": {
+            "state": STATE_CODES[slot['state']],
+            "squat_count": int(slot['rep_count']),
+            "selected_side": SIDE_CODES[slot['side']],
+            "feedback": [message for i, message in enumerate(FEEDBACK_MESSAGES) if slot['feedback'] & (1 << i)],
+            "angles": {"knee": angle('knee_angle'), "hip": angle('hip_angle'), "ankle": angle('ankle_angle')}
+        }
+    }
+
+def _analyze_record(tracker: RepTracker, record: np.void) -> Dict[str, Any]:
+    """Run one pose record through a session's tracker"""
+    count = int(record['landmark_count'])
+    landmarks = [
+        Point3D(x=x, y=y, z=z, visibility=v)
+        for x, y, z, v in record['landmarks'][:count].tolist()
+    ]
+
+    ball_position = None
+    if record['flags'] & FLAG_FRAME and record['flags'] & FLAG_BALL_DETECTION:
+        shape = tuple(int(v) for v in record['frame_shape'])
+        frame = record['frame'][:int(np.prod(shape))].reshape(shape).copy()
+        ball_position = tracker.analyzer.detect_ball(frame)
+
+    pose = Pose(landmarks=landmarks, timestamp=float(record['timestamp']))
+    image_width = int(record['image_width']) or None
+    result = tracker.update(pose, int(record['image_height']), ball_position, image_width)
+    result["ball_position"] = ball_position
+    return result
+
+def run_worker(inbox_name: str, outbox_name: str, capacity: int, frame_bytes: int, stop) -> None:
+    """Analysis worker process: owns the trackers for its shard of sessions.
+
+    stop is a lock-free shared flag (a RawValue): a worker killed while holding
+    a lock would otherwise leave it held for its replacement and the API process.
+    """
+    inbox = SharedRing(input_dtype(frame_bytes), capacity, name=inbox_name)
+    outbox = SharedRing(RESULT_DTYPE, capacity, name=outbox_name)
+    trackers: Dict[int, RepTracker] = {}
+
+    try:
+        while not stop.value:
+            record = inbox.peek()
+            if record is None:
+                time.sleep(0.0005)
+                continue
+
+            kind = int(record['kind'])
+            session = int(record['session'])
+            if kind == KIND_CLOSE:
+                trackers.pop(session, None)
+                inbox.release()
+                continue
+
+            # Sessions start on their first frame, so a restarted worker picks them up afresh
+            tracker = trackers.get(session)
+            if tracker is None:
+                tracker = trackers[session] = RepTracker(WallBallAnalyzer())
+
+            seq = int(record['seq'])
+            started = time.perf_counter()
+            try:
+                result = _analyze_record(tracker, record)
+            except Exception:
+                # A bad frame costs its own result, not the worker and every session on it
+                result = None
+            cost = time.perf_counter() - started
+
+            # Wait for the API process to drain results rather than lose one
+            slot = outbox.reserve()
+            while slot is None and not stop.value:
+                time.sleep(0.0005)
+                slot = outbox.reserve()
+            if slot is not None:
+                if result is None:
+                    slot['session'] = session
+                    slot['seq'] = seq
+                    slot['error'] = True
+                    slot['cost'] = cost
+                else:
+                    encode_result(slot, session, seq, result, cost)
+                outbox.commit()
+
+            inbox.release()
+    finally:
+        inbox.close()
+        outbox.close()
+
+class AnalysisPool:
+    """Pool of analysis worker processes fed through shared-memory rings.
+
+    Sessions are sharded across workers by a hash of the session id. The API
+    process only decodes JSON and copies pose arrays (and frames that fit in
+    frame_bytes) into the shard's input ring; results come back on a per-worker
+    result ring polled by a background task. The poll task also restarts dead
+    workers. Nothing here blocks the event loop: a full ring drops the frame,
+    and session closes that don't fit are retried by the poll task.
+    """
+    liveness_interval = 0.5  # seconds between worker liveness checks
+
+    def __init__(self, workers: int, capacity: int, frame_bytes: int, result_timeout: float = 2.0):
+        self.workers = workers
+        self.capacity = capacity
+        self.frame_bytes = frame_bytes
+        self.result_timeout = result_timeout
+        self.inboxes: List[SharedRing] = []
+        self.outboxes: List[SharedRing] = []
+        self.processes = []
+        self.context = None
+        self.stop_flag = None
+        self.poll_task: Optional[asyncio.Task] = None
+        self.pending: List[Dict[int, asyncio.Future]] = []  # Per shard, by seq
+        self.pending_closes: List[List[int]] = []  # Per shard
+        self.next_session = 0
+        self.next_seq = 0
+        self.restarts = 0
+
+    @property
+    def running(self) -> bool:
+        return self.poll_task is not None
+
+    def start(self) -> None:
+        """Create the rings, spawn the workers and start polling for results"""
+        self.context = mp.get_context("spawn")
+        self.stop_flag = self.context.RawValue('b', 0)
+        dtype = input_dtype(self.frame_bytes)
+        for _ in range(self.workers):
+            self.inboxes.append(SharedRing(dtype, self.capacity))
+            self.outboxes.append(SharedRing(RESULT_DTYPE, self.capacity))
+            self.pending.append({})
+            self.pending_closes.append([])
+            self.processes.append(self._spawn(len(self.processes)))
+        self.poll_task = asyncio.create_task(self._poll_results())
+
+    def _spawn(self, shard: int):
+        process = self.context.Process(
+            target=run_worker,
+            args=(self.inboxes[shard].name, self.outboxes[shard].name, self.capacity, self.frame_bytes, self.stop_flag),
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def _restart_dead_workers(self) -> None:
+        """Replace crashed workers; their sessions continue with fresh trackers"""
+        for shard, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            process.join(0)
+            # Nothing else touches a dead worker's rings, so they can be emptied in place
+            self.inboxes[shard].counters[:] = 0
+            self.outboxes[shard].counters[:] = 0
+            for future in self.pending[shard].values():
+                if not future.done():
+                    future.set_result(None)
+            self.pending[shard] = {}
+            self.pending_closes[shard] = []
+            self.processes[shard] = self._spawn(shard)
+            self.restarts += 1
+
+    async def stop(self) -> None:
+        """Stop the workers and free the shared memory"""
+        if self.poll_task is None:
+            return
+        self.poll_task.cancel()
+        self.poll_task = None
+        self.stop_flag.value = 1
+        for process in self.processes:
+            await asyncio.to_thread(process.join, 5)
+        for ring in self.inboxes + self.outboxes:
+            ring.close()
+        for pending in self.pending:
+            for future in pending.values():
+                future.cancel()
+        self.inboxes, self.outboxes, self.processes = [], [], []
+        self.pending, self.pending_closes = [], []
+
+    def _shard(self, session: int) -> int:
+        return session % self.workers
+
+    def _send_close(self, session: int) -> bool:
+        ring = self.inboxes[self._shard(session)]
+        slot = ring.reserve()
+        if slot is None:
+            return False
+        slot['kind'] = KIND_CLOSE
+        slot['session'] = session
+        ring.commit()
+        return True
+
+    def open_session(self, session_id: str) -> int:
+        """Pick a worker key for a session; the worker starts its tracker on the first frame"""
+        # Keys are spread by session id hash, then made unique with a counter
+        self.next_session += 1
+        return zlib.crc32(session_id.encode()) % self.workers + self.next_session * self.workers
+
+    def close_session(self, session: int) -> None:
+        """Drop a session's tracker on its worker, later if its ring is full"""
+        if not self._send_close(session):
+            self.pending_closes[self._shard(session)].append(session)
+
+    def _submit(self, session: int, data: Dict[str, Any], ball_detection: bool) -> Optional[Tuple[int, asyncio.Future]]:
+        """Queue one pose message on the session's worker; None if its ring is full"""
+        shard = self._shard(session)
+        ring = self.inboxes[shard]
+        slot = ring.reserve()
+        if slot is None:
+            return None
+
+        landmarks = np.asarray(
+            [(lm["x"], lm["y"], lm["z"], lm.get("visibility", 1.0)) for lm in data["landmarks"][:33]],
+            dtype=np.float32
+        ).reshape(-1, 4)
+
+        self.next_seq += 1
+        slot['kind'] = KIND_POSE
+        slot['session'] = session
+        slot['seq'] = self.next_seq
+        slot['timestamp'] = data["timestamp"]
+        slot['image_height'] = data.get("image_height", 720)
+        slot['image_width'] = data.get("image_width") or 0
+        slot['landmark_count'] = len(landmarks)
+        slot['landmarks'][:len(landmarks)] = landmarks
+
+        flags = FLAG_BALL_DETECTION if ball_detection else 0
+        if ball_detection and "frame" in data:
+            frame = np.asarray(data["frame"], dtype=np.uint8)
+            if frame.ndim == 3 and frame.shape[2] == 3 and frame.nbytes <= self.frame_bytes:
+                slot['frame_shape'] = frame.shape
+                slot['frame'][:frame.nbytes] = frame.ravel()
+                flags |= FLAG_FRAME
+        slot['flags'] = flags
+
+        seq = self.next_seq
+        future = asyncio.get_running_loop().create_future()
+        self.pending[shard][seq] = future
+        ring.commit()
+        return seq, future
+
+    async def _result(self, session: int, seq: int, future: asyncio.Future) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(future, self.result_timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.pending[self._shard(session)].pop(seq, None)
+
+    async def analyze(self, session: int, data: Dict[str, Any], ball_detection: bool) -> Optional[Dict[str, Any]]:
+        """Analyze one pose message on the session's worker.
+
+        Returns None if the ring is full, the worker could not analyze the frame,
+        or no result arrived within result_timeout.
+        """
+        submitted = self._submit(session, data, ball_detection)
+        if submitted is None:
+            return None
+        return await self._result(session, *submitted)
+
+    async def analyze_batch(self, session: int, frames: List[Dict[str, Any]],
+                            ball_detection: bool) -> List[Optional[Dict[str, Any]]]:
+        """Analyze consecutive pose messages, queueing all of them before waiting for any.
+
+        Results are in frame order, with None wherever analyze() would return None;
+        frames that don't fit in the ring are dropped, not waited for.
+        """
+        submitted = [self._submit(session, frame, ball_detection) for frame in frames]
+        results = iter(await asyncio.gather(*(self._result(session, *s) for s in submitted if s is not None)))
+        return [next(results) if s is not None else None for s in submitted]
+
+    async def _poll_results(self) -> None:
+        next_liveness_check = 0.0
+        while True:
+            drained = False
+            for shard, outbox in enumerate(self.outboxes):
+                record = outbox.peek()
+                while record is not None:
+                    future = self.pending[shard].pop(int(record['seq']), None)
+                    if future is not None and not future.done():
+                        future.set_result(None if record['error'] else decode_result(record))
+                    outbox.release()
+                    drained = True
+                    record = outbox.peek()
+
+                closes = self.pending_closes[shard]
+                while closes and self._send_close(closes[0]):
+                    closes.pop(0)
+
+            now = time.monotonic()
+            if now >= next_liveness_check:
+                self._restart_dead_workers()
+                next_liveness_check = now + self.liveness_interval
+
+            waiting = any(self.pending)
+            await asyncio.sleep(0 if drained else 0.001 if waiting else 0.01)
+
+analysis_pool = AnalysisPool(
+    workers=settings.analysis_workers,
+    capacity=settings.analysis_ring_capacity,
+    frame_bytes=settings.analysis_frame_bytes,
+    result_timeout=settings.analysis_result_timeout
+)
@@ -0,0 +1,35 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Pose, Point3D
+
+# Knee offsets (normalized x) for one squat: standing, down to the bottom and back up
+SQUAT_KNEE_OFFSETS = [0, 0, 0.03, 0.06, 0.1, 0.14, 0.18, 0.14, 0.1, 0.06, 0.03, 0, 0]
+
+def make_pose(knee_dx: float = 0.0, timestamp: float = 0.0, scale: float = 1.0, visibility: float = 0.9) -> Pose:
+    """Synthetic side-on athlete; scale grows the body about the frame center"""
+    def point(x, y, v=visibility):
+        return Point3D(x=0.5 + (x - 0.5) * scale, y=0.5 + (y - 0.5) * scale, z=0, visibility=v)
+
+    landmarks = [point(0.5, 0.2) for _ in range(33)]
+    for index, (x, y) in {
+        11: (0.45, 0.3), 12: (0.55, 0.3),
+        23: (0.46, 0.5), 24: (0.54, 0.5),
+        25: (0.46 + knee_dx, 0.6), 26: (0.54 + knee_dx, 0.6),
+        27: (0.46, 0.7), 28: (0.54, 0.7),
+        31: (0.48, 0.77), 32: (0.56, 0.77)
+    }.items():
+        landmarks[index] = point(x, y)
+    return Pose(landmarks=landmarks, timestamp=timestamp)
+
+def squat_sequence(reps: int, **kwargs):
+    """Poses for several squats, 100ms apart"""
+    offsets = SQUAT_KNEE_OFFSETS * reps
+    return [make_pose(dx, (i + 1) * 100.0, **kwargs) for i, dx in enumerate(offsets)]
+
+@pytest.fixture
+def squat_poses():
+    return squat_sequence
@@ -0,0 +1,76 @@
+from app.services.admission import AdmissionController
+
+def make_controller(**kwargs):
+    options = {"max_sessions": 2, "max_load": 0.8, "capacity": 1, "base_decimation": 3, "retry_after": 5}
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+def run_window(controller, load, frames=100):
+    """Report one second of frames that kept the analyzers busy for load of it"""
+    controller.window_start -= 1.0
+    controller.record_cost(load * controller.capacity)
+    controller.record_frame(frames)
+
+def overload(controller, seconds=1):
+    """Report busy windows above the budget"""
+    for _ in range(seconds):
+        run_window(controller, controller.max_load * 2)
+
+def test_rejects_past_max_sessions_and_frees_slots_on_release():
+    controller = make_controller()
+    assert controller.admit()
+    assert controller.admit()
+    assert not controller.admit()
+    controller.release()
+    assert controller.admit()
+
+def test_shed_level_rises_while_over_budget():
+    controller = make_controller()
+    overload(controller)
+    assert controller.shed_level == 1
+    assert not controller.ball_detection_enabled(priority=0)
+    assert controller.ball_detection_enabled(priority=1)
+
+    overload(controller, 2)
+    assert controller.shed_level == 3
+    assert controller.decimation(priority=0) == 9
+    assert controller.decimation(priority=3) == 3
+
+def test_fully_shed_worker_recovers_once_idle():
+    controller = make_controller()
+    overload(controller, controller.max_shed_level)
+    assert controller.shed_level == controller.max_shed_level
+    assert not controller.admit()
+
+    # No sessions left to send frames; admit() alone must notice the quiet time
+    controller.window_start -= 1.1
+    assert controller.admit()
+
+def test_long_idle_gap_recovers_one_level_per_second():
+    controller = make_controller()
+    overload(controller, 3)
+    controller.window_start -= 2.5
+    controller.admit()
+    assert controller.shed_level == 1
+
+def test_cheaper_frames_hold_the_shed_level_at_the_same_frame_rate():
+    controller = make_controller()
+    overload(controller)
+    assert controller.shed_level == 1
+
+    # Dropping ball detection brought the cost under budget; decimation is not needed
+    run_window(controller, controller.max_load * 0.9)
+    assert controller.shed_level == 1
+    assert controller.decimation(priority=0) == 3
+
+def test_load_is_shared_across_analysis_workers():
+    controller = make_controller(capacity=4)
+    run_window(controller, controller.max_load * 2, frames=1000)
+    assert controller.shed_level == 1
+    run_window(controller, controller.max_load / 2, frames=1000)
+    assert controller.shed_level == 0
+
+def test_priority_is_clamped_to_the_shed_levels():
+    controller = make_controller()
+    assert controller.clamp_priority(99) == controller.max_shed_level
+    assert controller.clamp_priority(-3) == 0
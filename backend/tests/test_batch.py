@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from app.models import Pose, Point3D
+from app.services import RepTracker, WallBallAnalyzer
+from app.services.utils import landmark_frames_to_array
+from conftest import squat_sequence
+
+def as_float32(pose):
+    """Round a pose to float32 landmarks, as a MediaPipe client sends them"""
+    landmarks = [
+        Point3D(**{name: float(np.float32(value)) for name, value in lm.model_dump().items()})
+        for lm in pose.landmarks
+    ]
+    return Pose(landmarks=landmarks, timestamp=pose.timestamp)
+
+def comparable(result):
+    """A tracker result without the wall-clock fields"""
+    result = dict(result, stats=dict(result["stats"]), state_machine=dict(result["state_machine"]))
+    result["state_machine"].pop("inactive_time", None)
+    if result["rep_data"] is not None:
+        result["rep_data"] = result["rep_data"].model_dump(exclude={"timestamp"})
+    return result
+
+@pytest.mark.parametrize("batch_size", [1, 5, 13])
+def test_batch_path_matches_single_frame_path(batch_size):
+    poses = [as_float32(pose) for pose in squat_sequence(3)]
+    single = RepTracker(WallBallAnalyzer())
+    expected = [single.update(pose, 720) for pose in poses]
+
+    batched = RepTracker(WallBallAnalyzer())
+    frames = [pose.model_dump() for pose in poses]
+    results = []
+    for start in range(0, len(frames), batch_size):
+        chunk = frames[start:start + batch_size]
+        landmarks, counts = landmark_frames_to_array(chunk)
+        assert landmarks.dtype == np.float32
+        results += batched.update_batch(
+            landmarks, counts, [frame["timestamp"] for frame in chunk], [720] * len(chunk), [None] * len(chunk)
+        )
+
+    assert [comparable(r) for r in results] == [comparable(r) for r in expected]
+    assert batched.stats["valid_squats"] == 3
+
+def test_accepted_batch_frame_does_not_pin_the_batch():
+    frames = [pose.model_dump() for pose in squat_sequence(1)]
+    landmarks, counts = landmark_frames_to_array(frames)
+    analyzer = WallBallAnalyzer()
+    plausible, _ = analyzer.check_pose_plausibility(landmarks[0, :counts[0]], 720)
+    assert plausible
+    assert analyzer.previous_landmarks.base is None
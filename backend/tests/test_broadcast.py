@@ -0,0 +1,79 @@
+import asyncio
+from app.api.websocket import _forward_to_subscriber
+from app.services.broadcast import Broadcaster
+from app.services.leaderboard import Leaderboard
+
+def test_session_named_like_a_heat_does_not_reach_heat_viewers():
+    async def scenario():
+        broadcaster = Broadcaster(max_buffer=4, max_dropped=4)
+        heat_viewer = broadcaster.subscribe([Leaderboard.topic("final")])
+        session_viewer = broadcaster.subscribe([broadcaster.session_topic("heat:final")])
+
+        broadcaster.publish(broadcaster.session_topic("heat:final"), "analysis")
+        assert heat_viewer.queue.empty()
+        assert session_viewer.queue.get_nowait() == "analysis"
+
+    asyncio.run(scenario())
+
+class RecordingSocket:
+    """Stands in for a viewer's WebSocket"""
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def send_text(self, message):
+        self.sent.append(message)
+
+    async def close(self, code, reason=None):
+        self.close_code = code
+
+def drain(subscriber):
+    messages = []
+    while not subscriber.queue.empty():
+        messages.append(subscriber.queue.get_nowait())
+    return messages
+
+def test_full_buffer_drops_the_oldest_message():
+    async def scenario():
+        broadcaster = Broadcaster(max_buffer=2, max_dropped=10)
+        viewer = broadcaster.subscribe(["session:a"])
+        for message in ("1", "2", "3"):
+            broadcaster.publish("session:a", message)
+        assert viewer.dropped == 1
+        assert not viewer.overrun
+        assert drain(viewer) == ["2", "3"]
+
+    asyncio.run(scenario())
+
+def test_subscriber_past_max_dropped_is_overrun_and_skipped():
+    async def scenario():
+        broadcaster = Broadcaster(max_buffer=1, max_dropped=2)
+        viewer = broadcaster.subscribe(["session:a"])
+        for message in ("1", "2", "3", "4"):
+            broadcaster.publish("session:a", message)
+        assert viewer.overrun
+        broadcaster.publish("session:a", "5")
+        assert drain(viewer) == ["4"]
+
+    asyncio.run(scenario())
+
+def test_forwarder_sends_and_then_disconnects_an_overrun_viewer():
+    async def scenario():
+        broadcaster = Broadcaster(max_buffer=1, max_dropped=1)
+        viewer = broadcaster.subscribe(["session:a"])
+        socket = RecordingSocket()
+        forwarder = asyncio.create_task(_forward_to_subscriber(socket, viewer))
+
+        broadcaster.publish("session:a", "1")
+        await asyncio.sleep(0)
+        assert socket.sent == ["1"]
+
+        # The forwarder is parked on the empty queue while the viewer falls behind
+        for message in ("2", "3", "4"):
+            broadcaster.publish("session:a", message)
+        assert viewer.overrun
+        await asyncio.wait_for(forwarder, 1)
+        assert socket.close_code == 1013
+        assert socket.sent == ["1"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,91 @@
+import cv2
+import numpy as np
+import pytest
+from app.services import RepTracker, WallBallAnalyzer
+from app.services.calibration import CalibrationStore
+from conftest import make_pose, squat_sequence
+
+LEFT_SIDE = (11, 23, 25, 27, 31)
+
+def occlude_left(pose):
+    for index in LEFT_SIDE:
+        pose.landmarks[index].visibility = 0.2
+    return pose
+
+def test_stored_side_does_not_override_visibility():
+    tracker = RepTracker(WallBallAnalyzer())
+    tracker.apply_calibration({"preferred_side": "left"})
+
+    sides = set()
+    for pose in squat_sequence(3):
+        result = tracker.update(occlude_left(pose), 720)
+        if result["state_machine"]["state"] != "no_pose":
+            sides.add(result["state_machine"]["selected_side"])
+
+    assert sides == {"right"}
+    assert tracker.calibration()["preferred_side"] == "right"
+
+def test_stored_side_breaks_visibility_ties():
+    for preferred in ("left", "right"):
+        tracker = RepTracker(WallBallAnalyzer())
+        tracker.apply_calibration({"preferred_side": preferred})
+        assert tracker.state_machine.update(make_pose())["selected_side"] == preferred
+
+def test_batch_path_uses_the_same_side_choice():
+    from app.services.utils import landmark_frames_to_array
+    tracker = RepTracker(WallBallAnalyzer())
+    tracker.apply_calibration({"preferred_side": "left"})
+
+    frames = [occlude_left(pose).model_dump() for pose in squat_sequence(1)]
+    landmarks, counts = landmark_frames_to_array(frames)
+    sides, _, _ = tracker.state_machine.batch_angles(landmarks)
+    assert (sides == 1).all()
+
+def test_store_keeps_athlete_and_camera_profiles_apart(tmp_path):
+    store = CalibrationStore(str(tmp_path))
+    store.save("lane1", "ann", {"reference_height": 300.0, "threshold_y": 20.0,
+                                "preferred_side": "right", "ball_roi": [0.1, 0.2, 0.3, 0.4]})
+
+    assert store.load("lane1", "ann")["reference_height"] == 300.0
+    # Other athletes on the camera only inherit the camera's fields
+    camera = store.load("lane1", "bob")
+    assert "reference_height" not in camera
+    assert camera["preferred_side"] == "right"
+
+    # Profiles survive a restart
+    assert CalibrationStore(str(tmp_path)).load("lane1", "ann")["sessions"] == 1
+    assert store.delete("lane1", "ann")
+    assert "reference_height" not in store.load("lane1", "ann")
+
+def ball_frame(width, height, x, y, radius=20):
+    frame = np.zeros((height, width, 3), np.uint8)
+    cv2.circle(frame, (x, y), radius, (255, 255, 255), -1)
+    return frame
+
+def roi_analyzer():
+    """Analyzer with a stored ball region around the chest, past its first full-frame scan"""
+    analyzer = WallBallAnalyzer()
+    analyzer.ball_detection_interval = 1
+    analyzer.frame_count = 1
+    analyzer.ball_roi = (0.45, 0.55, 0.55, 0.65)
+    return analyzer
+
+def test_ball_region_is_resolution_independent():
+    analyzer = roi_analyzer()
+    assert analyzer.detect_ball(ball_frame(640, 360, 320, 216))[:2] == (320, 216)
+    x, y, _ = analyzer.detect_ball(ball_frame(1280, 720, 640, 432))
+    assert abs(x - 640) <= 2 and abs(y - 432) <= 2
+    assert analyzer.ball_bounds[0] == pytest.approx(0.5, abs=0.01)
+
+def test_ball_region_always_reaches_the_throw_line():
+    analyzer = roi_analyzer()
+    analyzer.threshold_y = 120
+    # Far above the stored region and its margin, but above the throw line
+    assert analyzer.detect_ball(ball_frame(1280, 720, 640, 60)) is not None
+
+def test_periodic_full_frame_scan_finds_the_ball_outside_the_region():
+    analyzer = roi_analyzer()
+    outside = ball_frame(1280, 720, 80, 432)
+    found = [analyzer.detect_ball(outside) is not None for _ in range(analyzer.full_frame_scan_interval)]
+    assert found.count(True) == 1
+    assert analyzer.ball_bounds[0] < 0.1
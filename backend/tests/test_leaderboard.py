@@ -0,0 +1,66 @@
+import asyncio
+import json
+import random
+from app.services.broadcast import broadcaster
+from app.services.leaderboard import Heat, Leaderboard, ranking_key
+
+def _random_stats(rng):
+    return {
+        "total_wallball_reps": rng.randint(0, 5),
+        "valid_squats": rng.randint(0, 5),
+        "invalid_squats": rng.randint(0, 2),
+        "invalid_throws": rng.randint(0, 2)
+    }
+
+def test_incremental_ranking_matches_a_full_sort():
+    rng = random.Random(7)
+    heat = Heat("random")
+    stats = {}
+    standings = []
+    for _ in range(500):
+        session_id = f"lane-{rng.randint(0, 11)}"
+        if stats and rng.random() < 0.1:
+            removed = rng.choice(sorted(stats))
+            del stats[removed]
+            changes = heat.remove(removed)
+        else:
+            stats[session_id] = _random_stats(rng)
+            changes = heat.update(session_id, stats[session_id])
+
+        expected = heat.standings()
+        ranked = sorted(stats, key=lambda s: ranking_key(s, stats[s]))
+        assert [entry["session_id"] for entry in expected] == ranked
+
+        # Applying only the reported changes to the previous standings gives the new ones
+        patched = {entry["rank"]: entry for entry in standings if entry["rank"] <= len(expected)}
+        patched.update({entry["rank"]: entry for entry in changes})
+        assert [patched[rank] for rank in range(1, len(expected) + 1)] == expected
+        standings = expected
+
+def test_rank_changes_are_published_to_heat_viewers():
+    async def scenario():
+        board = Leaderboard()
+        viewer = broadcaster.subscribe([board.topic("semi")])
+        try:
+            board.register("semi", "a", {"total_wallball_reps": 1})
+            board.register("semi", "b", {"total_wallball_reps": 0})
+            viewer.queue.get_nowait()
+            viewer.queue.get_nowait()
+
+            board.update_session("b", {"total_wallball_reps": 2})
+            message = json.loads(viewer.queue.get_nowait())
+            assert message["type"] == "rank_changes"
+            assert message["heat_id"] == "semi"
+            assert [(entry["session_id"], entry["rank"]) for entry in message["data"]] == [("b", 1), ("a", 2)]
+
+            # An unchanged score publishes nothing
+            board.update_session("b", {"total_wallball_reps": 2})
+            assert viewer.queue.empty()
+
+            board.unregister("b")
+            message = json.loads(viewer.queue.get_nowait())
+            assert [(entry["session_id"], entry["rank"]) for entry in message["data"]] == [("a", 1)]
+        finally:
+            broadcaster.unsubscribe(viewer)
+
+    asyncio.run(scenario())
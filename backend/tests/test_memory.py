@@ -0,0 +1,29 @@
+import numpy as np
+from app.services import RepTracker, WallBallAnalyzer
+from app.services.utils import deep_getsizeof
+from conftest import squat_sequence
+
+def test_deep_size_counts_nested_and_shared_objects_once():
+    payload = np.zeros(1000, dtype=np.float64)
+    shared = {"payload": payload}
+    size = deep_getsizeof([shared, shared, payload[:10]])
+    assert payload.nbytes < size < 2 * payload.nbytes
+
+def test_tracker_memory_grows_with_rep_history():
+    tracker = RepTracker(WallBallAnalyzer())
+    empty = tracker.memory_usage()["rep_history"]
+    for pose in squat_sequence(3):
+        tracker.update(pose, 720)
+    assert len(tracker.rep_history) == 3
+    assert tracker.memory_usage()["rep_history"] > empty
+
+def test_segment_limits_are_shared_between_sessions():
+    assert WallBallAnalyzer().segment_min is WallBallAnalyzer().segment_min
+
+def test_memory_estimate_tracks_the_deep_measurement():
+    tracker = RepTracker(WallBallAnalyzer())
+    for pose in squat_sequence(4):
+        tracker.update(pose, 720)
+    measured = sum(tracker.memory_usage().values())
+    assert 0.5 * measured < tracker.memory_estimate() < 1.5 * measured
+    assert tracker.memory_estimate() > RepTracker(WallBallAnalyzer()).memory_estimate()
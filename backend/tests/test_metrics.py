@@ -0,0 +1,63 @@
+import pytest
+from app.services import RepTracker, WallBallAnalyzer
+from app.services.metrics import RepMetrics
+from conftest import make_pose, squat_sequence
+
+def feed(metrics, frames):
+    for timestamp, state, knee_angle in frames:
+        metrics.update(timestamp, state, knee_angle, [])
+
+# One rep: out of standing at 100ms, deepest at 200ms, an angle gap at 300ms, counted at 500ms
+FIRST_REP = [(0, 's1', 5), (100, 's2', 30), (200, 's3', 80), (300, None, 60), (400, 's2', 40), (500, 's1', 10)]
+
+def test_rep_timing_from_known_timestamps():
+    metrics = RepMetrics()
+    feed(metrics, FIRST_REP)
+    rep = metrics.finalize(10)
+    assert rep["max_depth"] == 80
+    assert rep["duration"] == pytest.approx(0.4)
+    assert rep["descent_time"] == pytest.approx(0.1)
+    assert rep["ascent_time"] == pytest.approx(0.3)
+    assert rep["time_under_load"] == pytest.approx(rep["duration"])
+    assert rep["cycle_time"] is None
+
+    feed(metrics, [(600, 's2', 30), (700, 's3', 90), (800, 's1', 10)])
+    rep = metrics.finalize(10)
+    assert rep["duration"] == pytest.approx(0.2)
+    assert rep["cycle_time"] == pytest.approx(0.3)
+
+def test_uncounted_return_to_standing_is_discarded():
+    metrics = RepMetrics()
+    feed(metrics, [(0, 's1', 5), (100, 's2', 30), (200, 's1', 5)])
+    metrics.discard()
+    feed(metrics, [(300, 's2', 30), (400, 's3', 70), (500, 's1', 5)])
+    rep = metrics.finalize(5)
+    assert rep["duration"] == pytest.approx(0.2)
+    assert rep["max_depth"] == 70
+
+def test_throw_is_timed_from_the_last_rep_bottom_once():
+    metrics = RepMetrics()
+    assert metrics.record_throw(100) is None
+
+    feed(metrics, FIRST_REP)
+    metrics.finalize(10)
+    assert metrics.record_throw(650) == pytest.approx(0.45)
+    assert metrics.record_throw(700) is None
+
+def test_next_rep_cancels_a_pending_throw():
+    metrics = RepMetrics()
+    feed(metrics, FIRST_REP)
+    metrics.finalize(10)
+    feed(metrics, [(600, 's2', 30)])
+    assert metrics.record_throw(650) is None
+
+def test_tracker_sends_a_late_throw_as_a_rep_update():
+    tracker = RepTracker(WallBallAnalyzer())
+    for pose in squat_sequence(1):
+        tracker.update(pose, 720)
+    assert tracker.stats["valid_squats"] == 1
+    tracker.analyzer.threshold_y = 100  # The synthetic athlete's line is above the frame
+
+    result = tracker.update(make_pose(timestamp=2000.0), 720, ball_position=(100, 0, 40))
+    assert result["rep_update"]["rep_number"] == 1
+    assert result["rep_update"]["throw_time"] == pytest.approx(tracker.rep_history[-1].throw_time)
@@ -0,0 +1,79 @@
+import pytest
+from app.services import RepTracker, WallBallAnalyzer
+from app.services.utils import landmarks_to_array
+from conftest import make_pose
+
+def count_valid_squats(poses, image_height, image_width=None):
+    tracker = RepTracker(WallBallAnalyzer())
+    for pose in poses:
+        tracker.update(pose, image_height, image_width=image_width)
+    return tracker.stats["valid_squats"]
+
+@pytest.mark.parametrize("image_height", [360, 480, 720, 1080, 2160])
+def test_known_good_squats_count_at_any_resolution(squat_poses, image_height):
+    assert count_valid_squats(squat_poses(3), image_height) == 3
+
+@pytest.mark.parametrize("image_width, image_height", [(640, 480), (1280, 720), (1080, 1920)])
+def test_known_good_squats_count_with_real_frame_width(squat_poses, image_width, image_height):
+    assert count_valid_squats(squat_poses(3), image_height, image_width) == 3
+
+@pytest.mark.parametrize("scale", [0.5, 1.0, 2.0])
+def test_athlete_size_in_frame_does_not_matter(squat_poses, scale):
+    # At 2.0 the athlete fills most of the frame height
+    assert count_valid_squats(squat_poses(3, scale=scale), 720) == 3
+
+def test_single_ghost_frame_is_rejected():
+    analyzer = WallBallAnalyzer()
+    good = landmarks_to_array(make_pose().landmarks)
+    assert analyzer.check_pose_plausibility(good, 720)[0]
+
+    ghost = good.copy()
+    ghost[24, 0] = 0.8  # Hips far wider than the torso is long
+    plausible, reason = analyzer.check_pose_plausibility(ghost, 720)
+    assert not plausible
+    assert reason.startswith("Implausible")
+
+def test_persistent_segment_failures_do_not_block_the_session():
+    analyzer = WallBallAnalyzer()
+    odd = landmarks_to_array(make_pose().landmarks)
+    odd[24, 0] = 0.8
+
+    results = [analyzer.check_pose_plausibility(odd, 720)[0] for _ in range(analyzer.max_rejected_frames + 3)]
+    assert results[:analyzer.max_rejected_frames] == [False] * analyzer.max_rejected_frames
+    assert all(results[analyzer.max_rejected_frames:])
+
+def test_segment_check_rearms_after_a_plausible_frame():
+    analyzer = WallBallAnalyzer()
+    good = landmarks_to_array(make_pose().landmarks)
+    odd = good.copy()
+    odd[24, 0] = 0.8
+
+    for _ in range(analyzer.max_rejected_frames + 1):
+        analyzer.check_pose_plausibility(odd, 720)
+    assert analyzer.check_pose_plausibility(good, 720)[0]
+    assert not analyzer.check_pose_plausibility(odd, 720)[0]
+
+def test_position_jump_is_measured_in_the_image_plane():
+    analyzer = WallBallAnalyzer()
+    landmarks = landmarks_to_array(make_pose().landmarks)
+    assert analyzer.check_pose_plausibility(landmarks, 720)[0]
+
+    # MediaPipe depth is noisy; a depth swing alone is not a jump
+    swung = landmarks.copy()
+    swung[:, 2] += 1.0
+    assert analyzer.check_pose_plausibility(swung, 720)[0]
+
+    jumped = swung.copy()
+    jumped[:, 0] += 0.4
+    assert not analyzer.check_pose_plausibility(jumped, 720)[0]
+
+def test_position_jump_limit_grows_with_the_time_between_frames():
+    analyzer = WallBallAnalyzer()
+    landmarks = landmarks_to_array(make_pose().landmarks)
+    assert analyzer.check_pose_plausibility(landmarks, 720, timestamp=0.0)[0]
+
+    # A throw moves the whole body 0.5 of the frame between heavily decimated frames
+    thrown = landmarks.copy()
+    thrown[:, 0] += 0.5
+    assert not analyzer.check_pose_plausibility(thrown, 720, timestamp=100.0)[0]
+    assert analyzer.check_pose_plausibility(thrown, 720, timestamp=400.0)[0]
@@ -0,0 +1,15 @@
+import pytest
+from app.services.profiler import SamplingProfiler
+
+def test_session_tag_is_cleared_on_every_exit_path():
+    profiler = SamplingProfiler()
+    for _ in range(2):
+        with profiler.session("a"):
+            assert profiler.active_session == "a"
+            continue
+    assert profiler.active_session is None
+
+    with pytest.raises(RuntimeError):
+        with profiler.session("a"):
+            raise RuntimeError
+    assert profiler.active_session is None
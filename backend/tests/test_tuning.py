@@ -0,0 +1,64 @@
+import json
+import os
+import cv2
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.services.tuning import load_corpus, load_profile, pareto_front, run_config, tune
+
+# Frames of a tiny corpus: ball center and diameter, or None
+CORPUS_BALLS = [None, (80, 60, 40), (80, 40, 40), None, (80, 30, 40), None]
+PARAMS = {'dp': 1.1, 'min_dist': 30, 'param1': 20, 'param2': 20, 'min_radius': 10, 'max_radius': 40}
+
+@pytest.fixture
+def corpus(tmp_path):
+    frames = []
+    for index, ball in enumerate(CORPUS_BALLS):
+        image = np.zeros((120, 160, 3), np.uint8)
+        if ball is not None:
+            cv2.circle(image, ball[:2], ball[2] // 2, (255, 255, 255), -1)
+        name = f"{index:04d}.png"
+        cv2.imwrite(str(tmp_path / name), image)
+        frames.append({"file": name, "ball": list(ball) if ball else None})
+    with open(tmp_path / "labels.json", "w") as f:
+        json.dump({"frames": frames}, f)
+    return str(tmp_path)
+
+def write_profile(directory, name, selected, mtime):
+    path = os.path.join(directory, name + ".json")
+    with open(path, "w") as f:
+        json.dump({"selected": selected}, f)
+    os.utime(path, (mtime, mtime))
+
+def test_profiles_added_or_updated_after_a_lookup_are_picked_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ball_profile_dir", str(tmp_path))
+    assert load_profile("gym") is None
+
+    write_profile(str(tmp_path), "gym", {"ball_detection_interval": 3}, 1000)
+    assert load_profile("gym") == {"ball_detection_interval": 3}
+
+    write_profile(str(tmp_path), "gym", {"ball_detection_interval": 5}, 2000)
+    assert load_profile("gym") == {"ball_detection_interval": 5}
+
+def test_pareto_front_drops_dominated_configurations():
+    cheap = {"cost_ms_per_frame": 1.0, "event_recall": 0.9, "precision": 0.9}
+    accurate = {"cost_ms_per_frame": 3.0, "event_recall": 1.0, "precision": 1.0}
+    worse = {"cost_ms_per_frame": 3.5, "event_recall": 0.9, "precision": 0.9}
+    assert pareto_front([worse, accurate, cheap]) == [cheap, accurate]
+
+def test_run_config_scores_every_corpus_frame(corpus):
+    paths, balls = load_corpus(corpus)
+    run = run_config(PARAMS, paths, balls)
+    assert run["outcomes"] == ['tn', 'tp', 'tp', 'tn', 'tp', 'tn']
+    assert run["detect_ms"] > 0
+
+def test_tune_selects_a_profile_from_the_grid(corpus):
+    grid = {key: [value] for key, value in PARAMS.items()}
+    grid['param2'] = [20, 200]  # 200 never finds a circle
+    report = tune(corpus, grid, [1, 2], min_recall=1.0, min_precision=1.0, workers=1)
+
+    assert report["frames"] == len(CORPUS_BALLS)
+    assert len(report["results"]) == 4
+    selected = report["selected"]
+    assert selected["ball_detection_params"]["param2"] == 20
+    assert selected["event_recall"] == 1.0 and selected["precision"] == 1.0
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import os
+import tempfile
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.video import parse_landmark_track, process_upload, shutdown_executor
+from conftest import squat_sequence
+
+@pytest.fixture
+def video_file(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for _ in range(10):
+        writer.write(np.zeros((48, 64, 3), np.uint8))
+    writer.release()
+    return path
+
+def test_non_object_frames_are_a_value_error():
+    with pytest.raises(ValueError):
+        parse_landmark_track([1, 2], 30.0)
+
+def test_bad_track_streams_an_error_event_and_removes_the_temp_file(video_file, monkeypatch):
+    created = []
+    mkstemp = tempfile.mkstemp
+
+    def recording_mkstemp(*args, **kwargs):
+        fd, path = mkstemp(*args, **kwargs)
+        created.append(path)
+        return fd, path
+    monkeypatch.setattr(tempfile, "mkstemp", recording_mkstemp)
+
+    with open(video_file, "rb") as video:
+        response = TestClient(app).post(
+            "/api/session/s/upload",
+            files={"video": ("clip.avi", video), "landmarks": ("track.json", json.dumps([1, 2]))}
+        )
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[-1]["type"] == "error"
+    assert len(created) == 1
+    assert not os.path.exists(created[0])
+
+def test_upload_report_keeps_reps_past_the_live_history_limit(video_file, monkeypatch):
+    monkeypatch.setattr("app.services.tracker.settings.rep_history_limit", 3)
+    track = [pose.model_dump() for pose in squat_sequence(5)]
+
+    async def collect():
+        return [event async for event in process_upload(video_file, track)]
+    try:
+        events = asyncio.run(collect())
+    finally:
+        shutdown_executor()
+
+    streamed = [event["data"] for event in events if event["type"] == "rep"]
+    result = events[-1]["data"]
+    assert len(streamed) == result["stats"]["total_reps"] == 5
+    assert [rep["rep_number"] for rep in result["reps"]] == [1, 2, 3, 4, 5]
@@ -0,0 +1,57 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from app.main import app
+from app.api.websocket import sessions
+from app.services.admission import admission
+from conftest import make_pose
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def test_invalid_priority_is_refused_without_taking_a_slot(client):
+    before = admission.active_sessions
+    with client.websocket_connect("/ws/session/bad-priority?priority=high") as ws:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1008
+    assert admission.active_sessions == before
+
+def test_failed_session_setup_releases_its_slot(client, monkeypatch):
+    def broken_tracker(*args, **kwargs):
+        raise RuntimeError("setup failed")
+    monkeypatch.setattr("app.api.websocket.RepTracker", broken_tracker)
+
+    before = admission.active_sessions
+    with pytest.raises(RuntimeError):
+        with client.websocket_connect("/ws/session/broken-setup") as ws:
+            ws.receive_json()
+    assert admission.active_sessions == before
+
+def test_oversized_pose_batch_closes_the_session(client, monkeypatch):
+    monkeypatch.setattr("app.api.websocket.settings.max_batch_frames", 2)
+    frame = {"landmarks": [], "timestamp": 0}
+
+    before = admission.active_sessions
+    with client.websocket_connect("/ws/session/big-batch") as ws:
+        ws.send_json({"type": "pose_batch", "data": {"frames": [frame] * 3}})
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1009
+    assert admission.active_sessions == before
+
+def test_priority_needs_the_admin_token(client):
+    before = admission.active_sessions
+    with client.websocket_connect("/ws/session/self-promoted?priority=4") as ws:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1008
+    assert admission.active_sessions == before
+
+def test_operator_priority_is_clamped(client, monkeypatch):
+    monkeypatch.setattr("app.core.security.settings.admin_token", "secret")
+    with client.websocket_connect("/ws/session/lane-vip?priority=99", headers={"x-admin-token": "secret"}) as ws:
+        ws.send_json({"type": "pose", "data": make_pose().model_dump()})
+        assert ws.receive_json()["type"] == "analysis"
+        assert sessions["lane-vip"]["priority"] == admission.max_shed_level
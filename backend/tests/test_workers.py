@@ -0,0 +1,167 @@
+import asyncio
+import multiprocessing as mp
+import threading
+import numpy as np
+from app.services.workers import (
+    AnalysisPool, FLAG_BALL_DETECTION, FLAG_FRAME, KIND_POSE, RESULT_DTYPE,
+    SharedRing, decode_result, encode_result, input_dtype, run_worker
+)
+from app.services.utils import landmarks_to_array
+from conftest import make_pose
+
+def pose_message(timestamp=100.0):
+    return {"timestamp": timestamp, "landmarks": [lm.model_dump() for lm in make_pose().landmarks]}
+
+def test_ring_is_fifo_across_wraparound():
+    ring = SharedRing(RESULT_DTYPE, 4)
+    try:
+        received = []
+        for seq in range(10):
+            slot = ring.reserve()
+            slot['seq'] = seq
+            ring.commit()
+            if seq % 2:
+                while (record := ring.peek()) is not None:
+                    received.append(int(record['seq']))
+                    ring.release()
+        assert received == list(range(10))
+        assert ring.peek() is None
+    finally:
+        ring.close()
+
+def test_ring_refuses_writes_when_full():
+    ring = SharedRing(RESULT_DTYPE, 2)
+    try:
+        for _ in range(2):
+            ring.reserve()
+            ring.commit()
+        assert ring.reserve() is None
+        ring.peek()
+        ring.release()
+        assert ring.reserve() is not None
+    finally:
+        ring.close()
+
+def test_result_round_trips_through_a_record():
+    result = {
+        "knee_angle": 42.0,
+        "rep_completed": True,
+        "stats": {"total_reps": 3, "valid_squats": 2, "invalid_squats": 1,
+                  "valid_throws": 1, "invalid_throws": 0, "total_wallball_reps": 1},
+        "ball_position": (10, 20, 30),
+        "rep_update": {"rep_number": 2, "throw_time": 0.5},
+        "state_machine": {"state": "s2", "selected_side": "right", "squat_count": 2,
+                          "feedback": ["LOWER YOUR HIPS"], "angles": {"knee": 42, "hip": None, "ankle": 7}}
+    }
+    slot = np.zeros(1, dtype=RESULT_DTYPE)[0]
+    encode_result(slot, 5, 9, result)
+    decoded = decode_result(slot)
+
+    assert not slot['error']
+    assert decoded["knee_angle"] == 42.0
+    assert decoded["rep_completed"] is True
+    assert decoded["stats"] == result["stats"]
+    assert decoded["ball_position"] == (10, 20, 30)
+    assert decoded["rep_update"] == {"rep_number": 2, "throw_time": 0.5}
+    assert decoded["state_machine"]["state"] == "s2"
+    assert decoded["state_machine"]["feedback"] == ["LOWER YOUR HIPS"]
+    assert decoded["state_machine"]["angles"] == {"knee": 42.0, "hip": None, "ankle": 7.0}
+
+def test_worker_survives_a_bad_frame():
+    frame_bytes = 64 * 64 * 3
+    inbox = SharedRing(input_dtype(frame_bytes), 4)
+    outbox = SharedRing(RESULT_DTYPE, 4)
+    stop = mp.RawValue('b', 0)
+    worker = threading.Thread(target=run_worker, args=(inbox.name, outbox.name, 4, frame_bytes, stop))
+    worker.start()
+    try:
+        landmarks = landmarks_to_array(make_pose().landmarks)
+        for seq, channels in ((1, 1), (2, 3)):
+            slot = inbox.reserve()
+            slot['kind'] = KIND_POSE
+            slot['session'] = 7
+            slot['seq'] = seq
+            slot['timestamp'] = seq * 100.0
+            slot['image_height'] = 720
+            slot['landmark_count'] = 33
+            slot['landmarks'] = landmarks
+            # A one-channel frame makes the ball detector raise
+            slot['frame_shape'] = (64, 64, channels)
+            slot['flags'] = FLAG_FRAME | FLAG_BALL_DETECTION
+            inbox.commit()
+
+        results = []
+        for _ in range(2000):
+            record = outbox.peek()
+            if record is not None:
+                results.append((int(record['seq']), bool(record['error'])))
+                outbox.release()
+                if len(results) == 2:
+                    break
+            else:
+                threading.Event().wait(0.001)
+        assert results == [(1, True), (2, False)]
+        assert worker.is_alive()
+    finally:
+        stop.value = 1
+        worker.join(5)
+
+def test_close_does_not_block_when_the_ring_is_full():
+    pool = AnalysisPool(workers=1, capacity=1, frame_bytes=16)
+    pool.inboxes = [SharedRing(input_dtype(16), 1)]
+    pool.pending_closes = [[]]
+    try:
+        pool.inboxes[0].reserve()
+        pool.inboxes[0].commit()
+        session = pool.open_session("a")
+        pool.close_session(session)
+        assert pool.pending_closes == [[session]]
+    finally:
+        pool.inboxes[0].close()
+
+def test_pool_restarts_a_dead_worker():
+    async def scenario():
+        pool = AnalysisPool(workers=1, capacity=8, frame_bytes=16, result_timeout=5.0)
+        pool.start()
+        try:
+            session = pool.open_session("a")
+            assert await pool.analyze(session, pose_message(), False) is not None
+
+            pool.processes[0].kill()
+            await asyncio.to_thread(pool.processes[0].join, 5)
+
+            result = None
+            for attempt in range(20):
+                result = await pool.analyze(session, pose_message(200.0 + attempt), False)
+                if result is not None:
+                    break
+                await asyncio.sleep(0.2)
+            assert result is not None
+            assert pool.restarts == 1
+        finally:
+            await pool.stop()
+
+    asyncio.run(scenario())
+
+def test_batch_is_queued_before_any_result_is_awaited():
+    async def scenario():
+        pool = AnalysisPool(workers=1, capacity=3, frame_bytes=16)
+        pool.inboxes = [SharedRing(input_dtype(16), 3)]
+        pool.pending = [{}]
+        try:
+            session = pool.open_session("a")
+            batch = asyncio.create_task(
+                pool.analyze_batch(session, [pose_message(100.0 * i) for i in range(1, 6)], False)
+            )
+            await asyncio.sleep(0)
+
+            # Every frame that fits is on the ring at once; the rest are dropped
+            assert int(pool.inboxes[0].counters[0]) == 3
+            for seq, future in list(pool.pending[0].items()):
+                future.set_result({"seq": seq})
+            results = await batch
+            assert [r and r["seq"] for r in results] == [1, 2, 3, None, None]
+        finally:
+            pool.inboxes[0].close()
+
+    asyncio.run(scenario())
@@ -1,5 +1,5 @@
 export interface WebSocketMessage {
-  type: 'pose' | 'config' | 'analysis';
+  type: 'pose' | 'pose_batch' | 'config' | 'analysis';
   data: any;
 }
 
@@ -16,6 +16,20 @@ export interface PoseMessage {
   };
 }
 
+export interface PoseBatchMessage {
+  type: 'pose_batch';
+  data: {
+    image_height?: number;
+    image_width?: number;
+    // At most MAX_BATCH_FRAMES (default 64); larger batches close the socket with 1009
+    frames: Array<PoseMessage['data'] & {
+      frame_id?: number;
+      image_height?: number;
+      image_width?: number;
+    }>;
+  };
+}
+
 export interface AnalysisMessage {
   type: 'analysis';
   data: {
@@ -26,5 +40,7 @@ export interface AnalysisMessage {
       validReps: number;
       invalidReps: number;
     };
+    // Throw timing for an already reported rep, once the throw is seen
+    rep_update?: { rep_number: number; throw_time: number } | null;
   };
 }
\ No newline at end of file